@@ -0,0 +1,46 @@
+"""Spawn latency of shell vs direct exec
+
+Runs real binaries, a shell builtin like echo would cost the shell path no extra exec.
+
+Usage:
+python benchmarks/spawn.py [YIELDS] [REPEAT]
+"""
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from unshell import Unshell  # noqa: E402
+
+COMMANDS = ["/bin/true", "env"]
+
+
+def script(command, count):
+    for _ in range(count):
+        yield command
+
+
+def bench(command, shell, count):
+    with Unshell({"shell": shell, "reporter": "quiet"}) as engine:
+        start = time.perf_counter()
+        engine(script, command, count)
+
+        return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    for command in COMMANDS:
+        for label, shell in [("shell", True), ("exec", "auto")]:
+            bench(command, shell, min(count, 50))  # warm up
+            median = statistics.median(bench(command, shell, count) for _ in range(repeat))
+            print(f"{command:>9} {label:>5}: {count} yields in {median:.2f}s (median of {repeat}), "
+                  f"{median / count * 1e6:.0f}us per spawn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Engine benchmark suite: spawn latency, fan-out, large outputs, sync vs async and CLI cold start
+
+Each case runs `--repeat` times, the median is kept. Results are written as JSON, and compared
+with a saved baseline when one is given: a case slower than the baseline by more than `--threshold`
+is a regression, and makes the suite exit with status 1.
+
+Usage:
+python benchmarks/suite.py [--quick] [--repeat 5] [--only fanout] [--output results.json]
+python benchmarks/suite.py --save benchmarks/baseline.json
+python benchmarks/suite.py --baseline benchmarks/baseline.json [--threshold 0.1]
+"""
+import os
+import sys
+import json
+import atexit
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from unshell import Unshell  # noqa: E402
+
+QUIET = {"reporter": "quiet"}
+MB = 1024 * 1024
+
+
+def sequential(count):
+    def script():
+        for _ in range(count):
+            yield "true"
+
+    return lambda: Unshell(QUIET)(script)
+
+
+def fanout(count):
+    def script():
+        yield ["true"] * count
+
+    return lambda: Unshell(QUIET)(script)
+
+
+def large_output(size):
+    def script():
+        output = yield f"head -c {size} /dev/zero"
+        assert len(output) == size
+
+    return lambda: Unshell(QUIET)(script)
+
+
+def sync_script(count):
+    def script():
+        for _ in range(count):
+            yield "echo hello"
+
+    return lambda: Unshell(QUIET)(script)
+
+
+def async_script(count):
+    async def script():
+        for _ in range(count):
+            yield "echo hello"
+
+    return lambda: Unshell(QUIET)(script)
+
+
+def cli_cold_start():
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as file:
+        file.write("def script():\n    yield 'true'\n")
+    atexit.register(os.unlink, file.name)
+
+    command = [sys.executable, "-m", "unshell.cli", "run", file.name]
+    cwd = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+    return lambda: subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+def cases(quick):
+    scale = 10 if quick else 1
+
+    return {
+        # name: (unit count, unit, bench)
+        "sequential": (200 // scale, "commands", sequential(200 // scale)),
+        "fanout-10": (10, "commands", fanout(10)),
+        "fanout-100": (100, "commands", fanout(100)),
+        "fanout-1000": (1000 // scale, "commands", fanout(1000 // scale)),
+        "large-output": (100 // scale, "MB", large_output(100 // scale * MB)),
+        "sync-script": (200 // scale, "yields", sync_script(200 // scale)),
+        "async-script": (200 // scale, "yields", async_script(200 // scale)),
+        "cli-cold-start": (1, "runs", cli_cold_start()),
+    }
+
+
+def measure(bench, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bench()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def run(args):
+    results = {}
+
+    for name, (count, unit, bench) in cases(args.quick).items():
+        if args.only and not any(only in name for only in args.only):
+            continue
+
+        timings = measure(bench, args.repeat)
+        median = statistics.median(timings)
+        results[name] = {
+            "median": median,
+            "min": min(timings),
+            "max": max(timings),
+            "rate": count / median,
+            "unit": f"{unit}/s",
+        }
+        print(f"{name:>15}: {median * 1e3:9.1f}ms  {count / median:10.1f} {unit}/s", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "quick": args.quick,
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Print the change of each case against the baseline, return the regressed ones"""
+    regressions = []
+
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+
+        change = result["median"] / before["median"] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:>15}: {change:+7.1%}{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="a tenth of the work, for a smoke run")
+    parser.add_argument("--only", action="append", help="run the cases containing this name, repeatable")
+    parser.add_argument("--output", help="write the results as JSON to this file, stdout by default")
+    parser.add_argument("--save", help="write the results as the new baseline")
+    parser.add_argument("--baseline", help="compare with the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown counted as a regression")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    for path in filter(None, [args.output, args.save]):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+    if not args.output and not args.save:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("quick") != report["quick"]:
+            print("baseline and results do not have the same scale, see --quick", file=sys.stderr)
+        sys.exit(1 if compare(report, baseline, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
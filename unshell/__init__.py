@@ -1,3 +1,47 @@
-from .core import Unshell as UnshellCore
+from typing import TYPE_CHECKING, Any
 
-Unshell = UnshellCore
+import importlib
+
+if TYPE_CHECKING:
+    from .core import Unshell, Runtime
+    from .result import CommandResult, ScriptResult
+    from .executor import Executor, Capabilities, SubprocessExecutor, DryRunExecutor
+    from .pipeline import PipelineResult
+    from .reporter import Reporter
+    from .trace import Tracer
+    from .cache import ResultCache
+    from .command import AsCompleted, Compute, Cmd, Stream, Gather, Pipeline, Graph, Task
+    from .graph import GraphResult
+    from .spill import SpilledResult
+    from .cassette import RecordingExecutor, ReplayExecutor
+
+# module of each export, imported on first access: the engine pulls asyncio in, which the cli only needs to run a script
+exports = {
+    "Unshell": ".core", "Runtime": ".core",
+    "Cmd": ".command", "Stream": ".command", "Gather": ".command", "Pipeline": ".command",
+    "Graph": ".command", "Task": ".command", "AsCompleted": ".command",
+    "Compute": ".command", "GraphResult": ".graph",
+    "SpilledResult": ".spill",
+    "CommandResult": ".result", "PipelineResult": ".pipeline", "ScriptResult": ".result",
+    "Executor": ".executor", "Capabilities": ".executor", "SubprocessExecutor": ".executor",
+    "DryRunExecutor": ".executor", "RecordingExecutor": ".cassette", "ReplayExecutor": ".cassette",
+    "Reporter": ".reporter", "Tracer": ".trace", "ResultCache": ".cache",
+}
+
+__all__ = [
+    "Unshell", "Runtime",
+    "Cmd", "Stream", "Gather", "Pipeline", "Graph", "Task", "AsCompleted", "Compute",
+    "CommandResult", "PipelineResult", "ScriptResult", "GraphResult", "SpilledResult",
+    "Executor", "Capabilities", "SubprocessExecutor", "DryRunExecutor", "RecordingExecutor", "ReplayExecutor",
+    "Reporter", "Tracer", "ResultCache",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(exports[name], __name__), name)
+    globals()[name] = value
+
+    return value
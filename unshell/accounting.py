@@ -0,0 +1,215 @@
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, cast
+from .result import CommandResult, Usage
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import threading
+import subprocess
+from functools import partial
+from contextlib import suppress
+from contextvars import ContextVar
+
+if TYPE_CHECKING:  # generic at runtime from Python 3.9 only
+    Child = subprocess.Popen[bytes]
+    Exited = asyncio.Future[Tuple[int, Usage]]
+
+
+class ScriptUsage:
+    """Resources used by the commands of one script, summed while it runs"""
+
+    def __init__(self) -> None:
+        self.commands = 0
+        self.user = 0.0
+        self.sys = 0.0
+        self.maxrss = 0
+        self.switches = 0
+
+    def add(self, usage: Usage) -> None:
+        self.commands += 1
+        self.user += usage.user
+        self.sys += usage.sys
+        self.maxrss = max(self.maxrss, usage.maxrss)
+        self.switches += usage.voluntary_switches + usage.involuntary_switches
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "cpu_user_ms": round(self.user * 1000),
+            "cpu_sys_ms": round(self.sys * 1000),
+            "max_rss_kib": self.maxrss,
+            "context_switches": self.switches,
+        }
+
+
+# usage of the script the current task works for, set by Runtime.run when "accounting" is on
+script_usage: ContextVar[Optional[ScriptUsage]] = ContextVar("script_usage", default=None)
+
+
+def record(result: CommandResult) -> None:
+    usage = script_usage.get()
+    if usage is not None and result.usage is not None:
+        usage.add(result.usage)
+
+
+class AccountedProcess:
+    """A child spawned off the loop thread and reaped with os.wait4, which gives its resource usage
+
+    It offers what the executor uses of asyncio.subprocess.Process: pid, returncode, stdout, stderr,
+    wait and communicate. asyncio child watchers reap with waitpid and drop the usage.
+    """
+
+    def __init__(
+        self,
+        popen: "subprocess.Popen[bytes]",
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader,
+        exited: "asyncio.Future[Tuple[int, Usage]]"
+    ) -> None:
+        self.popen = popen
+        self.pid = popen.pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self.usage: Optional[Usage] = None
+        self._exited = exited
+
+    @classmethod
+    async def start(cls, args: Union[str, List[str]], limit: int = 2 ** 16, **kwargs: Any) -> "AccountedProcess":
+        loop = asyncio.get_running_loop()
+        # fork and exec block, a worker thread does them while the loop keeps serving the other commands
+        spawning = cast("asyncio.Future[Child]", loop.run_in_executor(None, partial(
+            subprocess.Popen,
+            args,
+            shell=isinstance(args, str),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **kwargs
+        )))
+        try:
+            popen = await asyncio.shield(spawning)
+        except asyncio.CancelledError:  # the child comes anyway, do not leave it behind
+            spawning.add_done_callback(partial(abandon, loop, kwargs.get("start_new_session", False)))
+            raise
+
+        exited = reaper.watch(loop, popen)
+
+        return cls(popen, await pipe_reader(popen.stdout, limit), await pipe_reader(popen.stderr, limit), exited)
+
+    async def wait(self) -> int:
+        returncode, self.usage = await asyncio.shield(self._exited)
+        self.returncode = returncode
+        return returncode
+
+    async def communicate(self) -> Tuple[bytes, bytes]:
+        stdout, stderr = await asyncio.gather(self.stdout.read(), self.stderr.read())
+        await self.wait()
+
+        return stdout, stderr
+
+
+async def pipe_reader(pipe: Any, limit: int) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader(limit=limit)
+    await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+
+    return reader
+
+
+def abandon(loop: asyncio.AbstractEventLoop, session: bool, spawning: "asyncio.Future[Child]") -> None:
+    if spawning.cancelled() or spawning.exception() is not None:
+        return
+
+    popen = spawning.result()
+    with suppress(ProcessLookupError):
+        if session:  # the command and everything it started
+            os.killpg(popen.pid, signal.SIGKILL)
+        else:
+            popen.kill()
+    for pipe in (popen.stdout, popen.stderr):
+        cast(IO[bytes], pipe).close()
+    reaper.watch(loop, popen)
+
+
+class Reaper:
+    """Wait for accounted children without a thread blocked on each of them
+
+    With pidfds (Linux, Python 3.9+) the loop watches each child like any other file descriptor,
+    elsewhere a single thread polls every child in turn, for as long as there is one.
+    """
+    interval = 0.005
+
+    def __init__(self) -> None:
+        self._children: Dict[int, Tuple[asyncio.AbstractEventLoop, "Child", "Exited"]] = {}
+        self._lock = threading.Lock()
+        self._polling = False
+
+    def watch(self, loop: asyncio.AbstractEventLoop, popen: "Child") -> "Exited":
+        exited: "Exited" = loop.create_future()
+
+        if hasattr(os, "pidfd_open"):
+            try:
+                fd = os.pidfd_open(popen.pid)
+            except OSError:  # a kernel without pidfds
+                pass
+            else:
+                loop.add_reader(fd, self.reap, loop, fd, popen, exited)
+                return exited
+
+        with self._lock:
+            self._children[popen.pid] = (loop, popen, exited)
+            if not self._polling:
+                self._polling = True
+                threading.Thread(target=self.poll, daemon=True).start()
+
+        return exited
+
+    def reap(self, loop: asyncio.AbstractEventLoop, fd: int, popen: "Child", exited: "Exited") -> None:
+        loop.remove_reader(fd)
+        os.close(fd)
+        settle(exited, cast(Tuple[int, Usage], wait4(popen, 0)))  # readable once the child is gone
+
+    def poll(self) -> None:
+        while True:
+            with self._lock:
+                if not self._children:
+                    self._polling = False
+                    return
+                children = list(self._children.items())
+
+            for pid, (loop, popen, exited) in children:
+                outcome = wait4(popen, os.WNOHANG)
+                if outcome is None:
+                    continue
+                with self._lock:
+                    del self._children[pid]
+                with suppress(RuntimeError):  # the loop is already closed
+                    loop.call_soon_threadsafe(settle, exited, outcome)
+
+            time.sleep(self.interval)
+
+
+def wait4(popen: "Child", options: int) -> Optional[Tuple[int, Usage]]:
+    """The exit status and resource usage of a child, None while it runs with os.WNOHANG"""
+    pid, status, rusage = os.wait4(popen.pid, options)
+    if pid == 0:
+        return None
+
+    popen.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    usage = Usage(
+        rusage.ru_utime,
+        rusage.ru_stime,
+        rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss,  # bytes on macOS
+        rusage.ru_nvcsw,
+        rusage.ru_nivcsw,
+    )
+
+    return popen.returncode, usage
+
+
+def settle(exited: "Exited", outcome: Tuple[int, Usage]) -> None:
+    if not exited.done():
+        exited.set_result(outcome)
+
+
+reaper = Reaper()
@@ -0,0 +1,181 @@
+from typing import Any, Dict, Optional, Set, Tuple, Union, cast
+from .type import Options
+from .command import Cmd, SingleCommand
+from .client import encode
+from .core import defaultOptions
+from .daemon import remove_stale_socket
+from .executor import SubprocessExecutor
+from .scheduler import Scheduler
+
+import os
+import sys
+import hmac
+import json
+import base64
+import asyncio
+import ipaddress
+from functools import partial
+from contextlib import suppress
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """host:port for TCP, anything else is a unix socket path"""
+    host, _, port = address.rpartition(":")
+
+    if host and "/" not in address and port.isdigit():
+        return host.strip("[]"), int(port)
+
+    return address
+
+
+def is_loopback(address: Address) -> bool:
+    """Whether only this host can reach the address, unix sockets are guarded by their file mode"""
+    if not isinstance(address, tuple):
+        return True
+
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:  # a host name, it may resolve to any interface
+        return False
+
+
+async def open_connection(address: Address) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if isinstance(address, tuple):
+        return await asyncio.open_connection(*address, limit=sys.maxsize)  # a reply is one line, however large
+
+    return await asyncio.open_unix_connection(address, limit=sys.maxsize)
+
+
+def to_request(command: SingleCommand, opt: Options) -> Dict[str, Any]:
+    """What an agent needs to run a command: the engine env and settings are sent, not the local environment"""
+    cmd = command if isinstance(command, Cmd) else Cmd(command)
+
+    return {
+        "command": cmd.command if isinstance(cmd.command, str) else list(cmd.command),
+        "shell": opt["shell"] if cmd.shell is None else cmd.shell,
+        "env": {**(opt["env"] if opt["env"] is not os.environ else {}), **(cmd.env or {})},
+        "cwd": cmd.cwd or opt["cwd"],
+        "umask": opt["umask"] if cmd.umask is None else cmd.umask,
+        "limits": {**opt.get("limits", {}), **(cmd.limits or {})},
+    }
+
+
+class Agent:
+    """Run the commands sent by remote engines, listening on TCP or a unix socket
+
+    A connection carries many requests at once, each reply is sent as soon as its command is done.
+    Commands of an engine which goes away are killed. With a token, requests without it are refused.
+    Listening beyond the loopback requires a token, it is sent in clear: keep the network trusted.
+    """
+
+    def __init__(self, address: str, token: Optional[str] = None, opt: Optional[Options] = None) -> None:
+        self.address = parse_address(address)
+        if not token and not is_loopback(self.address):
+            raise ValueError(f"unshell: agent refuses to listen on {address} without a token, "
+                             "set UNSHELL_AGENT_TOKEN")
+        self.token = token
+        self.options: Options = {**defaultOptions, **(opt or {})}
+        self.scheduler = Scheduler(self.options["concurrency"])
+        self.executor = SubprocessExecutor()
+        self.served = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set["asyncio.Task[None]"] = set()
+
+    async def start(self) -> Address:
+        """Listen, return the address actually bound (e.g. the port picked for port 0)"""
+        if isinstance(self.address, tuple):
+            self.server = await asyncio.start_server(self.handle, *self.address, limit=sys.maxsize)
+            self.address = self.server.sockets[0].getsockname()[:2]
+            return self.address
+
+        remove_stale_socket(self.address)
+        umask = os.umask(0o177)  # only the owner may send commands
+        try:
+            self.server = await asyncio.start_unix_server(self.handle, self.address, limit=sys.maxsize)
+        finally:
+            os.umask(umask)
+
+        return self.address
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for connection in list(self._connections):  # stops their commands too
+                connection.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+        if isinstance(self.address, str):
+            with suppress(FileNotFoundError):
+                os.unlink(self.address)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks: Dict[Any, "asyncio.Future[None]"] = {}
+        connection = cast("asyncio.Task[None]", asyncio.current_task())
+        self._connections.add(connection)
+
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                id = message.get("id")
+
+                if self.token is not None and not hmac.compare_digest(str(message.get("token")), self.token):
+                    writer.write(encode({"id": id, "error": "unshell: agent refused the token"}))
+                    break
+                if "ping" in message:
+                    writer.write(encode({"id": id, "pong": True, "running": len(tasks)}))
+                elif "cancel" in message:
+                    if message["cancel"] in tasks:
+                        tasks[message["cancel"]].cancel()
+                elif "run" in message:
+                    tasks[id] = asyncio.ensure_future(self.run(message["run"], id, writer))
+                    tasks[id].add_done_callback(partial(tasks.pop, id))  # called with the task as pop default
+        except (ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:  # the agent is closing
+            pass
+        finally:
+            self._connections.discard(connection)
+            for task in list(tasks.values()):  # the engine is gone, so are its commands
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            with suppress(ConnectionError):
+                writer.close()
+
+    async def run(self, request: Dict[str, Any], id: Any, writer: asyncio.StreamWriter) -> None:
+        opt = {**self.options, **{name: request[name] for name in ("shell", "env", "cwd", "umask")}}
+        opt["limits"] = request.get("limits", {})  # older engines do not send limits
+        command = Cmd(request["command"])
+
+        try:
+            result = await self.scheduler.run(lambda: self.executor.run(command, opt))
+            self.served += 1
+            reply = {
+                "id": id,
+                "returncode": result.returncode,
+                "stdout": base64.b64encode(result.stdout).decode(),
+                "stderr": base64.b64encode(result.stderr).decode(),
+                "pid": result.pid,
+            }
+        except Exception as err:
+            reply = {"id": id, "error": f"unshell: agent failed to run the command: {err}"}
+
+        if not writer.is_closing():
+            writer.write(encode(reply))
+
+
+def serve(address: str, token: Optional[str] = None) -> None:
+    async def main() -> None:
+        agent = Agent(address, token)
+        print(f"unshell: agent listening on {await agent.start()}")
+        try:
+            await cast(asyncio.AbstractServer, agent.server).serve_forever()
+        finally:
+            await agent.close()
+
+    asyncio.run(main())
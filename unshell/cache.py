@@ -0,0 +1,202 @@
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from .type import Options
+from .command import Cmd, SingleCommand, to_argv, to_shell
+from .environ import Environ, settings
+from .result import CommandResult
+
+import os
+import re
+import json
+import time
+import marshal
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import suppress
+from contextvars import ContextVar
+
+
+# counters of the script running in this context, its summary reports them rather than the engine-wide ones
+script_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("script_stats", default=None)
+
+
+def new_stats() -> Dict[str, int]:
+    return dict.fromkeys(("deduped", "hits", "misses", "collapsed"), 0)
+
+
+def count(name: str, amount: int = 1) -> None:
+    stats = script_stats.get()
+    if stats is not None:
+        stats[name] += amount
+
+
+class Flight:
+    """A command being run for every caller asking for its result meanwhile"""
+    __slots__ = ("task", "callers")
+
+    def __init__(self, task: "asyncio.Future[CommandResult]") -> None:
+        self.task = task
+        self.callers = 0
+
+
+class ResultCache:
+    """Reuse the results of idempotent commands, set with the "cache" option
+
+    A command is cached when it is a Cmd with `cache` set (True or a TTL in seconds),
+    or when its shell form matches one of `patterns`. Results are keyed by command, env and cwd,
+    kept `ttl` seconds, at most `size` of them in memory (least recently used go first),
+    and also in `dir` when given, to be reused across runs. Failures and spilled outputs are never cached.
+    Identical commands asked for while one runs wait for its result instead of spawning again.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        size: int = 1024,
+        patterns: Iterable[str] = (),
+        dir: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.size = size
+        self.patterns = re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+        self.dir = dir
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self._results: "OrderedDict[str, Tuple[float, CommandResult]]" = OrderedDict()
+        self._flights: Dict[str, Flight] = {}
+
+    def ttl_of(self, command: SingleCommand) -> Optional[float]:
+        """Seconds the result of the command may be reused, None when it is not cached"""
+        if isinstance(command, Cmd) and command.cache is not None:
+            if command.cache is True:
+                return self.ttl
+            return float(command.cache) or None
+
+        if self.patterns is not None and self.patterns.search(to_shell(command)):
+            return self.ttl
+
+        return None
+
+    def key(self, command: SingleCommand, opt: Options, environ: Environ) -> str:
+        env = environ.of(command, opt)
+        cwd, umask = settings(command, opt)
+        argv = to_argv(command, opt["shell"])
+
+        return hashlib.sha256(json.dumps([
+            to_shell(command) if argv is None else argv,
+            sorted((os.environ if env is None else env).items()),
+            os.path.abspath(cwd or os.getcwd()),
+            umask,
+        ]).encode()).hexdigest()
+
+    async def run(
+        self,
+        key: str,
+        ttl: float,
+        job: Callable[[], Awaitable[CommandResult]]
+    ) -> Tuple[CommandResult, bool]:
+        """The result of the job, from the cache when possible, and whether it was run for this call"""
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            count("hits")
+            return result, False
+
+        flight = self._flights.get(key)
+        fresh = flight is None
+        if flight is None:
+            self.misses += 1
+            count("misses")
+            flight = self._flights[key] = Flight(asyncio.ensure_future(job()))
+            flight.task.add_done_callback(lambda task: self.settle(key, ttl, task))
+        else:
+            self.collapsed += 1
+            count("collapsed")
+
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task), fresh
+        except asyncio.CancelledError:
+            if flight.callers == 1 and not flight.task.done():  # nobody else waits for it, kill it
+                flight.task.cancel()
+            raise
+        finally:
+            flight.callers -= 1
+
+    def settle(self, key: str, ttl: float, task: "asyncio.Future[CommandResult]") -> None:
+        del self._flights[key]
+
+        if not task.cancelled() and task.exception() is None and not task.result().spilled:
+            self.put(key, ttl, task.result())
+
+    def get(self, key: str) -> Optional[CommandResult]:
+        entry = self._results.get(key)
+        if entry is not None:
+            expires, result = entry
+            if expires > self.clock():
+                self._results.move_to_end(key)
+                return result
+            del self._results[key]
+
+        return self.load(key)
+
+    def put(self, key: str, ttl: float, result: CommandResult) -> None:
+        self.remember(key, ttl, result)
+        self.store(key, ttl, result)
+
+    def remember(self, key: str, ttl: float, result: CommandResult) -> None:
+        self._results[key] = (self.clock() + ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def load(self, key: str) -> Optional[CommandResult]:
+        if self.dir is None:
+            return None
+
+        path = os.path.join(self.dir, key)
+        try:
+            with open(path, "rb") as file:
+                expires, command, returncode, stdout, stderr, encoding = marshal.load(file)
+        except (OSError, ValueError, EOFError, TypeError):  # not cached, or a corrupted entry
+            return None
+
+        remaining = expires - time.time()
+        if remaining <= 0:
+            with suppress(OSError):
+                os.unlink(path)
+            return None
+
+        result = CommandResult(command, returncode, stdout, stderr, encoding=encoding)
+        self.remember(key, remaining, result)
+
+        return result
+
+    def store(self, key: str, ttl: float, result: CommandResult) -> None:
+        if self.dir is None:
+            return
+
+        entry = (time.time() + ttl, result.command, result.returncode, result.stdout, result.stderr, result.encoding)
+        path = os.path.join(self.dir, key)
+        temporary = f"{path}.{os.getpid()}"
+
+        with suppress(OSError):  # an unwritable cache dir only costs the reuse across runs
+            os.makedirs(self.dir, exist_ok=True)
+            with open(temporary, "wb") as file:
+                marshal.dump(entry, file)
+            os.replace(temporary, path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "collapsed": self.collapsed}
+
+
+def resolve_cache(opt: Options) -> ResultCache:
+    cache = opt["cache"]
+
+    if isinstance(cache, ResultCache):  # shared between engines
+        return cache
+
+    return ResultCache(**cache)
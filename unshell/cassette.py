@@ -0,0 +1,171 @@
+from typing import IO, Any, Deque, Dict, List, Optional, cast
+from .type import Options
+from .command import SingleCommand, to_shell
+from .core import script_yield
+from .executor import Capabilities, Executor, SubprocessExecutor
+from .result import CommandResult
+
+import json
+import base64
+import asyncio
+from collections import deque
+
+VERSION = 1
+
+
+def to_entry(result: CommandResult) -> Dict[str, Any]:
+    """A result as a cassette line, outputs are kept as text when they decode and left out when empty"""
+    entry: Dict[str, Any] = {"command": result.command}
+
+    if result.returncode:
+        entry["returncode"] = result.returncode
+    for name, output in (("stdout", bytes(result.stdout)), ("stderr", result.stderr)):
+        if not output:
+            continue
+        try:
+            entry[name] = output.decode(result.encoding)
+        except UnicodeDecodeError:
+            entry[f"{name}_base64"] = base64.b64encode(output).decode()
+
+    return entry
+
+
+def from_entry(entry: Dict[str, Any]) -> CommandResult:
+    return CommandResult(entry["command"], entry.get("returncode", 0), output(entry, "stdout"), output(entry, "stderr"))
+
+
+def output(entry: Dict[str, Any], name: str) -> bytes:
+    if f"{name}_base64" in entry:
+        return base64.b64decode(entry[f"{name}_base64"])
+
+    return cast(str, entry.get(name, "")).encode()
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as file:
+        header, *lines = file.read().splitlines()
+
+    if json.loads(header).get("cassette") != VERSION:
+        raise ValueError(f"unshell: {path} is not a cassette of version {VERSION}")
+
+    return [json.loads(line) for line in lines]
+
+
+class RecordingExecutor:
+    """Run commands with another executor and record their results in a cassette
+
+    The cassette is a JSON lines file, one command and its result per line, in the order they finished.
+    Each line is written as soon as its command is done: a script stopped halfway keeps what it ran.
+    """
+
+    def __init__(self, path: str, executor: Optional[Executor] = None) -> None:
+        self.path = path
+        self.executor: Executor = executor or SubprocessExecutor()
+        # a Stream is read by the script as it goes, there is no result to record
+        self.capabilities = self.executor.capabilities._replace(streaming=False)
+        self._file: Optional[IO[str]] = None
+        self._opened = False
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        result = await self.executor.run(command, opt)
+        self.write({**to_entry(result), "yield": script_yield.get()})  # replays check the order of the yields
+
+        return result
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        raise TypeError("unshell: recording executor can not spawn processes")
+
+    async def close(self) -> None:
+        await self.executor.close()
+        self.open().close()  # a script without commands still gets its (empty) cassette
+        self._file = None
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        file = self.open()
+        file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        file.flush()
+
+    def open(self) -> IO[str]:
+        """The cassette file, started over by the first recording of the executor and appended to after a close"""
+        if self._file is None:
+            self._file = open(self.path, "a" if self._opened else "w", encoding="utf-8")
+            if not self._opened:
+                self._file.write(json.dumps({"cassette": VERSION}) + "\n")
+            self._opened = True
+
+        return self._file
+
+
+class ReplayExecutor:
+    """Answer commands with the results of a cassette, without spawning any process
+
+    Each command gets the recorded results of the same command, in the order they were recorded:
+    the commands of a parallel list may run in any order, but not the yields of the script. A command missing
+    from the cassette raises, or with strict=False gets an empty result, so does a command answered from
+    another step of the recorded script than the yield asking for it. Either way, it is kept in `divergences`
+    with the recorded commands the script did not yield, `verify` raises if there is any.
+    The cassette is replayed by one script at a time.
+    """
+    capabilities = Capabilities(streaming=False, argv=True, shell=True)
+
+    def __init__(self, path: str, strict: bool = True) -> None:
+        self.path = path
+        self.strict = strict
+        self.recorded: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.unexpected: List[str] = []
+        self.reordered: List[str] = []
+        self._yields: Dict[int, int] = {}  # recorded yield answering each replayed yield
+
+        for entry in load(path):
+            self.recorded.setdefault(entry["command"], deque()).append(entry)
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        shell_command = to_shell(command)
+        entries = self.recorded.get(shell_command)
+
+        if entries:
+            entry = entries.popleft()
+            if "yield" in entry and not self.in_order(script_yield.get(), entry["yield"]):
+                self.reordered.append(shell_command)
+                if self.strict:
+                    raise Exception(f"unshell: {shell_command} is recorded at another step in {self.path}")
+            return from_entry(entry)
+
+        self.unexpected.append(shell_command)
+        if self.strict:
+            raise Exception(f"unshell: {shell_command} is not recorded in {self.path}")
+
+        return CommandResult(shell_command, 0)
+
+    def in_order(self, replayed: int, recorded: int) -> bool:
+        """Whether a yield maps to a single recorded yield, and later yields to later recorded ones"""
+        if replayed in self._yields:
+            return self._yields[replayed] == recorded
+
+        before = [self._yields[position] for position in self._yields if position < replayed]
+        after = [self._yields[position] for position in self._yields if position > replayed]
+        if any(previous >= recorded for previous in before) or any(recorded >= next for next in after):
+            return False
+
+        self._yields[replayed] = recorded  # the other commands of the yield must come from the same one
+        return True
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        raise TypeError("unshell: replay executor can not spawn processes")
+
+    async def close(self) -> None:
+        pass
+
+    @property
+    def divergences(self) -> List[str]:
+        """Commands yielded but not recorded (+), recorded but not yielded (-) and yielded out of order (~)"""
+        unplayed = [entry["command"] for entries in self.recorded.values() for entry in entries]
+
+        return [f"+ {command}" for command in self.unexpected] + [f"- {command}" for command in unplayed] + \
+            [f"~ {command}" for command in self.reordered]
+
+    def verify(self) -> None:
+        divergences = self.divergences
+
+        if divergences:
+            raise Exception(f"unshell: replay diverged from {self.path}\n" + "\n".join(divergences))
@@ -1,64 +1,152 @@
 #!/usr/bin/env python
 
-from typing import List, Any, cast
+from typing import Iterator, List, Any, Optional, Tuple, cast
 from unshell.type import Args, Script
 
 import os
 import sys
-import importlib.util
-from unshell.core import Unshell
+import time
+import importlib
+import contextlib
+from unshell.loader import cache_dir, load_script_module
 from unshell.utils import colors
 
+# imported once a script is run, in this order for --time-startup to tell them apart
+ENGINE_IMPORTS = ["typing", "inspect", "asyncio", "unshell.core"]
+Timings = Optional[List[Tuple[str, float]]]
+
 
 def help(argv: Args, env: os._Environ) -> None:
     print("""
 Execute script through unshell runtime
 
 Usage:
-unshell COMMAND [SCRIPT_PATH] [ARGS...]
+unshell COMMAND [OPTIONS] [SCRIPT_PATH] [ARGS...]
 
 Commands:
 help      Print this help message
 run       run a script through unshell runtime
+serve     keep a warm unshell running scripts submitted with run --daemon
+agent     run the commands of remote engines, on [ADDRESS] (host:port or socket, 127.0.0.1:7700)
+
+Options:
+--cache           keep the compiled script in ~/.cache/unshell (or set UNSHELL_CACHE=1)
+--time-startup    print where the startup time goes
+--daemon          run the script on the unshell serve daemon (socket: UNSHELL_SOCKET)
 """)
 
 
 def run(argv: List[Any], env: os._Environ) -> None:
+    flags = []
+    rest = argv[2:]
+    while rest and rest[0] in ("--cache", "--time-startup", "--daemon"):
+        flags.append(rest.pop(0))
+
     try:
-        [_, __, scriptPath, *args] = argv
+        [scriptPath, *args] = rest
     except ValueError:
         return help(argv, env)
 
-    script = resolveScript(scriptPath)
-    opt = {
-        "env": env
-    }
+    if "--daemon" in flags:
+        return run_on_daemon(scriptPath, args, env)
+
+    timings: Timings = [] if "--time-startup" in flags else None
+    cache = cache_dir(env) if "--cache" in flags or env.get("UNSHELL_CACHE") == "1" else None
 
     try:
-        Unshell(opt)(script, *args)
-    except Exception as err:  # TODO: handle unshell exception
-        raise Exception(f"""{colors.red('✘')} unshell: something went wrong. Please, Make sure your script is valid
+        Unshell = import_engine(timings)
+        with timed(timings, "load script" + (" (cache)" if cache else "")):
+            script = resolveScript(scriptPath, cache)
+
+        opt = {
+            "env": env
+        }
+
+        try:
+            with timed(timings, "run script"), Unshell(opt) as engine:
+                engine(script, *args)
+        except Exception as err:  # TODO: handle unshell exception
+            raise Exception(f"""{colors.red('✘')} unshell: something went wrong. Please, Make sure your script is valid
 {err}
 """)
+    finally:
+        if timings is not None:
+            report_timings(timings)
+
+
+def run_on_daemon(scriptPath: str, args: List[str], env: os._Environ) -> None:
+    from unshell.client import socket_path, submit  # socket and json, only for --daemon
+
+    error = submit(socket_path(env), scriptPath, args, env, sys.stdout)
+
+    if error is not None:
+        raise Exception(f"""{colors.red('✘')} unshell: something went wrong. Please, Make sure your script is valid
+{error}
+""")
+
+
+def serve(argv: List[Any], env: os._Environ) -> None:
+    from unshell.client import socket_path
+    from unshell.daemon import serve as serve_daemon
+
+    path = argv[2] if len(argv) > 2 else socket_path(env)
+    print(f"unshell: serving on {path}")
+
+    try:
+        serve_daemon(path)
+    except KeyboardInterrupt:
+        pass
 
 
-def resolveScript(scriptPath: str) -> Script:
+def agent(argv: List[Any], env: os._Environ) -> None:
+    from unshell.agent import serve as serve_agent
+
     try:
-        spec = importlib.util.spec_from_file_location("script", scriptPath)
-        if spec is None:
-            raise TypeError("ModuleSpec is None")
-        module = importlib.util.module_from_spec(spec)
+        serve_agent(argv[2] if len(argv) > 2 else "127.0.0.1:7700", env.get("UNSHELL_AGENT_TOKEN"))
+    except KeyboardInterrupt:
+        pass
+
 
-        loader = spec.loader
-        if loader is None:
-            raise TypeError("Loader is None")
-        loader.exec_module(module)
+def resolveScript(scriptPath: str, cache: Optional[str] = None) -> Script:
+    try:
+        module = load_script_module(scriptPath, cache)
 
         return cast(Script, module.script)
     except Exception:
         raise Exception(f"{colors.red('✘')} unshell: Invalid script or script path")
 
 
+def import_engine(timings: Timings) -> Any:
+    """The engine pulls asyncio in, it is only imported to run a script"""
+    for name in ENGINE_IMPORTS:
+        with timed(timings, f"import {name}" + (" (already loaded)" if name in sys.modules else "")):
+            importlib.import_module(name)
+
+    from unshell.core import Unshell
+
+    return Unshell
+
+
+@contextlib.contextmanager
+def timed(timings: Timings, label: str) -> Iterator[None]:
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((label, time.perf_counter() - start))
+
+
+def report_timings(timings: List[Tuple[str, float]]) -> None:
+    for label, elapsed in timings:
+        print(f"{elapsed * 1e3:8.1f}ms  {label}", file=sys.stderr)
+    print(f"{sum(elapsed for _, elapsed in timings) * 1e3:8.1f}ms  total, {len(sys.modules)} modules loaded",
+          file=sys.stderr)
+
+
 def cli(argv: List[Any], env: os._Environ) -> None:
     try:
         [_, unshell_command, *rest] = argv
@@ -67,7 +155,9 @@ def cli(argv: List[Any], env: os._Environ) -> None:
 
     command_switcher = {
         "help": help,
-        "run": run
+        "run": run,
+        "serve": serve,
+        "agent": agent,
     }
 
     try:
@@ -0,0 +1,63 @@
+from typing import Any, Dict, IO, List, Mapping, Optional, cast
+
+import os
+import json
+import socket
+import struct
+
+# the client is what `unshell run --daemon` imports: it stays free of asyncio and of the engine
+
+
+def socket_path(env: Mapping[str, str]) -> str:
+    if env.get("UNSHELL_SOCKET"):
+        return env["UNSHELL_SOCKET"]
+    if env.get("XDG_RUNTIME_DIR"):
+        return os.path.join(env["XDG_RUNTIME_DIR"], f"unshell-{os.getuid()}.sock")
+
+    # e.g. under cron: a directory of its own, anybody may create a socket right in /tmp
+    return os.path.join(env.get("TMPDIR") or "/tmp", f"unshell-{os.getuid()}", "unshell.sock")
+
+
+def owner_of(connection: socket.socket, path: str) -> int:
+    """Uid of the process listening on a unix socket, from its credentials where the platform gives them"""
+    if hasattr(socket, "SO_PEERCRED"):  # Linux
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return cast(int, struct.unpack("3i", credentials)[1])
+
+    return os.stat(path).st_uid
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    """Both ends exchange one JSON object per line"""
+    return json.dumps(message).encode() + b"\n"
+
+
+def submit(path: str, script: str, args: List[str], env: Mapping[str, str], out: IO[str]) -> Optional[str]:
+    """Run a script on the daemon listening on `path` and copy its output to `out`, return its error if it failed"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise Exception(f"unshell: no daemon listening on {path}, start one with `unshell serve`")
+
+        # the request carries the whole environment, secrets included: only to a daemon of the same user
+        if owner_of(connection, path) != os.getuid():
+            raise Exception(f"unshell: the daemon listening on {path} belongs to another user")
+
+        connection.sendall(encode({
+            "script": os.path.abspath(script),
+            "args": args,
+            "env": dict(env),
+            "cwd": os.getcwd(),
+        }))
+
+        with connection.makefile("r", encoding="utf-8") as messages:
+            for line in messages:
+                message = json.loads(line)
+                if "out" in message:
+                    out.write(message["out"])
+                    out.flush()
+                if "exit" in message:
+                    return message.get("error")
+
+    return "unshell: the daemon closed the connection"
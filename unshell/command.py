@@ -0,0 +1,198 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, \
+    Union
+
+import re
+import shlex
+
+
+class Cmd(NamedTuple):
+    """Yield a Cmd to run a command with explicit settings
+
+    A sequence of arguments is executed directly, without /bin/sh.
+    A str is run through /bin/sh, unless it is shell free and shell is not forced.
+    shell left to None falls back on the engine "shell" option.
+    env is added to the engine environment, cwd, umask and timeout (seconds) replace the engine ones.
+    cache reuses the result of an idempotent command: True for the engine cache TTL, or a TTL in seconds.
+    limits are resource limits of the process, added to the engine "limits" option, e.g. {"nofile": 256}.
+    """
+    command: Union[str, Sequence[str]]
+    shell: Optional[bool] = None
+    env: Optional[Dict[str, str]] = None
+    cwd: Optional[str] = None
+    umask: Optional[int] = None
+    timeout: Optional[float] = None
+    cache: Union[bool, float, None] = None
+    limits: Optional[Dict[str, int]] = None
+
+
+SingleCommand = Union[str, Sequence[str], Cmd]
+
+SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\*?\[\]#~{}!\n\r]")
+SHELL_BUILTINS = frozenset([
+    ".", ":", "alias", "bg", "break", "case", "cd", "command", "continue", "do", "done", "elif", "else",
+    "esac", "eval", "exec", "exit", "export", "fg", "fi", "for", "function", "getopts", "hash", "if",
+    "jobs", "local", "read", "readonly", "return", "set", "shift", "source", "then", "times", "trap",
+    "type", "ulimit", "umask", "unalias", "unset", "until", "wait", "while",
+])
+
+
+def to_argv(command: SingleCommand, shell: Any = "auto") -> Optional[List[str]]:
+    """Return the arguments to execute directly, None when the command needs /bin/sh"""
+    if isinstance(command, Cmd):
+        return to_argv(command.command, shell if command.shell is None else command.shell)
+
+    if not isinstance(command, str):
+        return list(command)
+
+    if shell is True:
+        return None
+
+    if shell is False:
+        return shlex.split(command)
+
+    return shell_free(command)
+
+
+def shell_free(command: str) -> Optional[List[str]]:
+    """Split a command made of plain words, None as soon as it uses any shell feature"""
+    if SHELL_SYNTAX.search(command):
+        return None
+
+    try:
+        argv = shlex.split(command)
+    except ValueError:  # unbalanced quotes, let the shell report it
+        return None
+
+    if not argv or "=" in argv[0] or argv[0] in SHELL_BUILTINS:
+        return None
+
+    return argv
+
+
+def to_shell(command: SingleCommand) -> str:
+    if isinstance(command, Cmd):
+        return to_shell(command.command)
+
+    if isinstance(command, str):
+        return command
+
+    return shlex.join(command)
+
+
+class Stream(NamedTuple):
+    """Yield a Stream to get back an async iterator over the command output
+
+    Lines are yielded by default, fixed size chunks when chunk_size is set.
+    At most `limit` bytes are buffered per pipe, whatever the child writes.
+    """
+    command: str
+    chunk_size: Optional[int] = None
+    encoding: str = "utf-8"
+    limit: int = 64 * 1024
+
+
+class Gather(NamedTuple):
+    """Yield a Gather to run commands in parallel, like a list, with its own concurrency limit
+
+    dedupe runs each distinct command once, None falls back on the engine "dedupe" option.
+    """
+    commands: List[SingleCommand]
+    concurrency: Optional[int] = None
+    dedupe: Optional[bool] = None
+
+
+def identity(command: SingleCommand) -> Hashable:
+    """What makes two commands the same, a Cmd with a different setting is another command"""
+    if isinstance(command, Cmd):
+        env = tuple(sorted(command.env.items())) if command.env else None
+        limits = tuple(sorted(command.limits.items())) if command.limits else None
+        return (
+            identity(command.command), command.shell, env, command.cwd, command.umask, command.timeout,
+            command.cache, limits
+        )
+
+    if isinstance(command, str):
+        return command
+
+    return tuple(command)
+
+
+def distinct(commands: Sequence[SingleCommand]) -> Tuple[List[SingleCommand], List[int]]:
+    """The distinct commands in order of appearance, and the index of each command among them"""
+    indexes: Dict[Hashable, int] = {}
+    unique: List[SingleCommand] = []
+    positions = []
+
+    for command in commands:
+        key = identity(command)
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = len(unique)
+            unique.append(command)
+        positions.append(index)
+
+    return unique, positions
+
+
+class AsCompleted(NamedTuple):
+    """Yield AsCompleted from an async script to get (index, result) pairs as soon as each command is done
+
+    async for index, result in (yield AsCompleted(commands)): ...
+
+    The commands start once yielded, those still running are killed by `aclose()` or at the end of the script.
+    """
+    commands: List[SingleCommand]
+    concurrency: Optional[int] = None
+
+
+class Compute(NamedTuple):
+    """Yield Compute to call a CPU-heavy function in the engine process pool, the script gets its return value
+
+    The function and its arguments are pickled, it must be defined at the top level of a module.
+    """
+    function: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+
+
+Stage = Union[SingleCommand, Callable[[Iterator[str]], Iterable[str]]]
+
+
+class Pipeline(NamedTuple):
+    """Yield a Pipeline to chain stages through OS pipes, without /bin/sh
+
+    A stage is a command, or a function turning an iterator of lines into lines (e.g. a generator):
+    Pipeline(["cat app.log", only_errors, ("sort", "-u")])
+    Lines are handed over without their trailing newline.
+    """
+    stages: Sequence[Stage]
+    encoding: str = "utf-8"
+
+
+def stage_name(stage: Stage) -> str:
+    if callable(stage):
+        return getattr(stage, "__name__", repr(stage))
+
+    return to_shell(stage)
+
+
+class Task(NamedTuple):
+    """A node of a Graph, run once the tasks it needs are done
+
+    command can be a function building the command from the results of the needed tasks:
+    Task(lambda results: f"docker push {results['build'].strip()}", needs=["build"])
+    """
+    command: Union[SingleCommand, Callable[[Dict[str, Any]], SingleCommand]]
+    needs: Sequence[str] = ()
+
+
+class Graph(NamedTuple):
+    """Yield a Graph to run tasks as soon as the tasks they need are done, within the engine concurrency
+
+    tasks maps names to a Task, or to a command needing nothing. The script gets a GraphResult:
+    the result of every task by name, along with the critical path of the run.
+    """
+    tasks: Dict[str, Union[Task, SingleCommand]]
+
+
+def task_of(task: Union[Task, SingleCommand]) -> Task:
+    return task if isinstance(task, Task) else Task(task)
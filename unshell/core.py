@@ -1,104 +1,644 @@
-from typing import Any, Callable, List, Union, cast, Type, Optional, Awaitable
-from .type import CommandResult, Script, Command, Engine, \
+from typing import Any, Callable, Union, cast, Type, Optional, Awaitable, AsyncGenerator, AsyncIterator, \
+    Dict, Iterable, List, Sequence, Tuple, TypeVar
+from .type import YieldResult, Script, Command, \
     AsyncScript, Options, Commands, AsyncCommands, Args
-
+from .command import AsCompleted, Compute, Cmd, Stream, Gather, Graph, Pipeline, Task, SingleCommand, to_argv, \
+    to_shell, stage_name, distinct
+from .scheduler import Completed, Job, Scheduler
+from .result import CommandResult, ScriptResult
+from .executor import Executor, resolve_executor, signal_group
+from .environ import Environ
+from .reporter import Reporter, resolve_reporter
+from .trace import Tracer
+from .cache import count, new_stats, resolve_cache, script_stats
+from .accounting import ScriptUsage, record, script_usage
+from .graph import GraphResult, critical_path, tasks_of, toposort
+from .pipeline import PipelineResult, run_pipeline
+
+import codecs
+import time
+import signal
 import inspect
 import asyncio
+from functools import partial
+from concurrent import futures
+from contextlib import suppress
+from contextvars import ContextVar
+
+AsyncSend = Callable[[YieldResult], Awaitable[Command]]
+Send = Callable[[YieldResult], Command]
+T = TypeVar("T")
 
-AsyncSend = Callable[[Optional[Union[str, List[str]]]], Awaitable[Union[str, List[str]]]]
-Send = Callable[[Optional[Union[str, List[str]]]], Union[str, List[str]]]
+# position of the yield being run in its script, the commands it spawns copy it, e.g. for the record executor
+script_yield: ContextVar[int] = ContextVar("script_yield", default=0)
 
 defaultOptions: Options = {
-    "env": {}
+    "env": {},
+    "inherit_env": True,
+    "concurrency": 64,
+    "shell": "auto",
+    "cwd": None,
+    "umask": None,
+    "timeout": None,
+    "script_timeout": None,
+    "fail_fast": True,
+    "kill_grace": 2.0,
+    "executor": "subprocess",
+    "cassette": None,
+    "reporter": "print",
+    "max_output": None,
+    "accounting": False,
+    "limits": {},
+    "tracer": None,
+    "cache": {},
+    "dedupe": False,
+    "spill": None,
+    "spill_dir": None,
+    "steps": "loop",
+    "threads": 4,
+    "processes": None,
+    "pool": {},
+    "remote": {},
 }
 
 
-def Unshell(opt: Optional[Options] = defaultOptions) -> Engine:
-    async def engine(script: Union[Script, AsyncScript], *args: Args) -> Any:
+def Unshell(opt: Optional[Options] = defaultOptions) -> "Runtime":
+    return Runtime(opt)
+
+
+class Runtime:
+    """Long lived engine, its options and scheduler are shared by every script it runs
+
+    Await `run` from a running loop (many scripts can run at once), or call the engine synchronously:
+    `engine(script)` runs the script on a loop closed right after, like asyncio.run. Within `with engine:`,
+    or with `run_sync`, scripts run on a loop the engine keeps until `close`.
+    """
+
+    def __init__(self, opt: Optional[Options] = defaultOptions) -> None:
+        self.options: Options = {**defaultOptions, **(opt or {})}
+        self.scheduler = Scheduler(self.options["concurrency"])
+        self.executor: Executor = resolve_executor(self.options)
+        self.environ = Environ()
+        self.reporter: Reporter = resolve_reporter(self.options)
+        self.cache = resolve_cache(self.options)
+        self.deduped = 0
+        self.tracer: Optional[Tracer] = Tracer() if self.options["tracer"] is True else self.options["tracer"] or None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._keep_loop = False
+        self._pools: Dict[str, futures.Executor] = {}
+
+    async def run(self, script: Union[Script, AsyncScript], *args: Args) -> Any:
+        timeout = self.options["script_timeout"]
+        span = self.tracer.start("script", getattr(script, "__name__", repr(script))) if self.tracer else None
+        usage = ScriptUsage() if self.options["accounting"] else None
+        stats = new_stats()
+        token = script_usage.set(usage)  # the script task copies the context, hence the usage and stats
+        stats_token = script_stats.set(stats)
+
+        try:
+            return await asyncio.wait_for(self.run_script(script, *args), timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"unshell: script timed out after {timeout}s")
+        finally:
+            script_usage.reset(token)
+            script_stats.reset(stats_token)
+            self.reporter.summary({**stats, **(usage.summary() if usage is not None else {})})
+            self.reporter.flush()
+            if span is not None:
+                cast(Tracer, self.tracer).end(span)
+
+    def stats(self) -> Dict[str, int]:
+        """Commands saved since the engine started, by all its scripts: deduped in lists, and cache hits,
+        misses and collapses. The summary of each script only counts its own commands.
+        """
+        return {"deduped": self.deduped, **self.cache.stats()}
+
+    async def run_script(self, script: Union[Script, AsyncScript], *args: Args) -> Any:
         if is_async_generator(script):
             commands = script(*args)
             commands = cast(AsyncCommands, commands)
 
-            return await iter(commands.asend, StopAsyncIteration, True)
+            return await iter(commands.asend, StopAsyncIteration, True, self)
 
         if is_generator(script):
             commands = script(*args)
             commands = cast(Commands, commands)
 
-            return await iter(commands.send, StopIteration, False)
+            return await iter(commands.send, StopIteration, False, self)
 
         raise TypeError('unshell: Invalid SCRIPT')
 
-    return lambda script, *args: asyncio.run(engine(script, *args))
+    async def run_many(
+        self,
+        batch: Iterable[Tuple[Union[Script, AsyncScript], Sequence[Args]]],
+        concurrency: Optional[int] = None
+    ) -> List[ScriptResult]:
+        """Interleave scripts on the loop, at most `concurrency` of them at once
+
+        Their commands share the engine process budget, a failing script does not stop the others.
+        """
+        scripts = Scheduler(concurrency)
+
+        async def run_one(script: Union[Script, AsyncScript], args: Sequence[Args]) -> ScriptResult:
+            try:
+                return ScriptResult(script, tuple(args), await self.run(script, *args))
+            except Exception as err:
+                return ScriptResult(script, tuple(args), error=err)
+
+        return await scripts.gather([partial(run_one, script, args) for script, args in batch])
+
+    def run_many_sync(
+        self,
+        batch: Iterable[Tuple[Union[Script, AsyncScript], Sequence[Args]]],
+        concurrency: Optional[int] = None
+    ) -> List[ScriptResult]:
+        return self._run_until_complete(self.run_many(batch, concurrency))
+
+    def run_sync(self, script: Union[Script, AsyncScript], *args: Args) -> Any:
+        return self._run_until_complete(self.run(script, *args))
+
+    def _run_until_complete(self, coroutine: Awaitable[T]) -> T:
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+
+        task = asyncio.ensure_future(coroutine, loop=self._loop)
+        try:
+            return self._loop.run_until_complete(task)
+        except BaseException:  # e.g. KeyboardInterrupt, let the commands in flight be killed
+            if not task.done():
+                task.cancel()
+                with suppress(BaseException):
+                    self._loop.run_until_complete(task)
+            raise
+
+    def __call__(self, script: Union[Script, AsyncScript], *args: Args) -> Any:
+        if self._keep_loop or (self._loop is not None and not self._loop.is_closed()):
+            return self.run_sync(script, *args)
+
+        try:
+            return self.run_sync(script, *args)
+        finally:  # a one-shot call cleans up after itself
+            self.close()
+
+    def close(self) -> None:
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        self._loop.run_until_complete(cancel_leftovers())
+        self._loop.run_until_complete(self.aclose())
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        if hasattr(self._loop, "shutdown_default_executor"):  # python 3.9+
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+        self._loop.close()
+
+    async def aclose(self) -> None:
+        self.reporter.close()
+        await self.executor.close()
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+        self._pools.clear()
+
+    async def offload(self, pool: str, function: Callable[..., T], *args: Any) -> T:
+        """Call a function in the "threads" or "processes" pool of the engine, created on first use"""
+        if pool not in self._pools:
+            self._pools[pool] = futures.ThreadPoolExecutor(self.options["threads"], "unshell-step") \
+                if pool == "threads" else futures.ProcessPoolExecutor(self.options["processes"])
+
+        return await asyncio.get_running_loop().run_in_executor(self._pools[pool], partial(function, *args))
+
+    def __enter__(self) -> "Runtime":
+        self._keep_loop = True
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._keep_loop = False
+        self.close()
+
+    async def __aenter__(self) -> "Runtime":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+async def cancel_leftovers() -> None:
+    """Cancel and await the tasks still pending on the loop, e.g. jobs of an iterator a script did not exhaust"""
+    current = asyncio.current_task()
+    pending = [task for task in asyncio.all_tasks() if task is not current]
+
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
 
 
 async def iter(
     send: Union[Send, AsyncSend],
     exception: Union[Type[StopIteration], Type[StopAsyncIteration]],
-    is_async: bool
-) -> None:
-    cmd_res: CommandResult = None
+    is_async: bool,
+    engine: Runtime
+) -> YieldResult:
+    cmd_res: YieldResult = None
     command: Command = ""
+    position = 0
+
+    tracer = engine.tracer
+    threaded = not is_async and engine.options["steps"] == "thread"
+    # closed with the script: a break, or a Stream never read, leaves their commands running
+    opened: List[Union[Completed[CommandResult], Streamed]] = []
+
+    try:
+        while True:
+            try:
+                step = tracer.start("step", "script") if tracer else None
+                if is_async:
+                    send = cast(AsyncSend, send)
+                    command = await send(cmd_res)
+                elif threaded:  # the script code runs on a worker thread, the loop keeps draining outputs
+                    done, command = await engine.offload("threads", step_generator, send, cmd_res)
+                    if done:
+                        raise cast(BaseException, command)
+                else:
+                    send = cast(Send, send)
+                    command = send(cmd_res)
+                if step is not None:
+                    cast(Tracer, tracer).end(step)
+
+                if not isValidCmd(command):
+                    continue
+
+                script_yield.set(position)
+                position += 1
+                if tracer is None:
+                    cmd_res = await run(command, is_async, engine)
+                else:
+                    span = tracer.start("yield", describe(command))
+                    cmd_res = await run(command, is_async, engine)
+                    tracer.end(span)
+                if isinstance(cmd_res, (Completed, Streamed)):
+                    opened.append(cmd_res)
+
+            except exception as command:
+                if not hasattr(command, "value"):  # if there is no return
+                    break
+
+                if not isValidCmd(command.value):
+                    break
+
+                script_yield.set(position)
+                cmd_res = await run(command.value, is_async, engine)
+                break
+    finally:
+        for completed in opened:
+            await completed.aclose()
 
-    while True:
-        try:
-            if is_async:
-                send = cast(AsyncSend, send)
-                command = await send(cmd_res)
-            else:
-                send = cast(Send, send)
-                command = send(cmd_res)
+    return cmd_res
 
-            if not isValidCmd(command):
-                continue
 
-            if isinstance(command, list):
-                cmd_res = await asyncio.gather(*[exec(cmd) for cmd in command])
-            else:
-                cmd_res = await exec(command)
+async def run(command: Command, is_async: bool, engine: Runtime) -> YieldResult:
+    if isinstance(command, Stream):
+        if not is_async:
+            raise TypeError('unshell: Stream can only be yielded from an async SCRIPT')
 
-        except exception as command:
-            if not hasattr(command, "value"):  # if there is no return
-                break
+        return await stream(command, engine)
 
-            if not isValidCmd(command.value):
-                break
+    if isinstance(command, Pipeline):
+        return await engine.scheduler.run(partial(pipe, command, engine))
 
-            if isinstance(command, list):
-                cmd_res = await asyncio.gather(*[exec(cmd) for cmd in command.value])
-            else:
-                cmd_res = await exec(command.value)
-            break
+    if isinstance(command, Graph):
+        return await run_graph(command, engine)
+
+    if isinstance(command, Compute):
+        return await engine.offload("processes", command.function, *command.args)
+
+    queued_at = time.perf_counter() if engine.tracer else None
+
+    if isinstance(command, AsCompleted):
+        if not is_async:
+            raise TypeError('unshell: AsCompleted can only be yielded from an async SCRIPT')
+
+        return engine.scheduler.as_completed(
+            [partial(exec, cmd, engine, queued_at) for cmd in command.commands],
+            command.concurrency,
+            engine.options["fail_fast"],
+            acquire=False
+        )
+
+    if isinstance(command, (Gather, list)):
+        batch = command if isinstance(command, Gather) else Gather(command)
+        dedupe = engine.options["dedupe"] if batch.dedupe is None else batch.dedupe
+
+        if not dedupe:
+            return await engine.scheduler.gather(
+                [partial(exec, cmd, engine, queued_at) for cmd in batch.commands],
+                batch.concurrency,
+                engine.options["fail_fast"],
+                acquire=False
+            )
+
+        commands, positions = distinct(batch.commands)
+        engine.deduped += len(positions) - len(commands)
+        count("deduped", len(positions) - len(commands))
+        results = await engine.scheduler.gather(
+            [partial(exec, cmd, engine, queued_at) for cmd in commands],
+            batch.concurrency,
+            engine.options["fail_fast"],
+            acquire=False
+        )
+
+        return [results[position] for position in positions]
+
+    return await exec(cast(SingleCommand, command), engine, queued_at)
+
+
+async def exec(command: SingleCommand, engine: Runtime, queued_at: Optional[float] = None) -> CommandResult:
+    return await slotted(command, engine, partial(traced, command, engine, queued_at))
+
+
+async def slotted(command: SingleCommand, engine: Runtime, job: Job[CommandResult]) -> CommandResult:
+    """Run the job of a command under a slot of the scheduler, once for all its callers when it is cached
+
+    The shared run of a cached command holds the slot, not its callers: cache hits and collapsed callers
+    take none, and the first caller being cancelled leaves the slot to the run the others still wait for.
+    """
+    ttl = engine.cache.ttl_of(command)
+    if ttl is None:
+        return await engine.scheduler.run(job)
+
+    key = engine.cache.key(command, engine.options, engine.environ)
+    result, fresh = await engine.cache.run(key, ttl, partial(engine.scheduler.run, job))
+    if not fresh:
+        engine.reporter.command(f"{to_shell(command)} (cached)")
+        engine.reporter.result(result)
+
+    return result
+
+
+async def traced(command: SingleCommand, engine: Runtime, queued_at: Optional[float] = None) -> CommandResult:
+    if engine.tracer is None:
+        return await run_command(command, engine)
+
+    span = engine.tracer.start("command", to_shell(command), queued_at)
+    try:
+        result = await run_command(command, engine)
+        span.args.update(returncode=result.returncode, pid=result.pid)
+        return result
+    finally:
+        engine.tracer.end(span)
+
+
+async def run_command(command: SingleCommand, engine: Runtime) -> CommandResult:
+    engine.reporter.command(to_shell(command))
+
+    if not engine.executor.capabilities.shell and to_argv(command, engine.options["shell"]) is None:
+        raise TypeError(f"unshell: {to_shell(command)} needs a shell, the executor can not provide one")
+
+    timeout = command.timeout if isinstance(command, Cmd) and command.timeout is not None \
+        else engine.options["timeout"]
+    start = time.perf_counter()
+
+    try:
+        result = await asyncio.wait_for(engine.executor.run(command, engine.options), timeout)
+    except asyncio.TimeoutError:
+        err = f"{to_shell(command)}: timed out after {timeout}s"
 
+        engine.reporter.error(err)
+        raise Exception(err)
+
+    result.wall = time.perf_counter() - start
+    record(result)
+
+    return check(result, engine.reporter)
+
+
+async def pipe(pipeline: Pipeline, engine: Runtime) -> PipelineResult:
+    engine.reporter.command(' | '.join(stage_name(stage) for stage in pipeline.stages))
+
+    if not engine.executor.capabilities.streaming:
+        raise TypeError('unshell: Pipeline is not supported by the executor')
+
+    start = time.perf_counter()
+    result = await run_pipeline(pipeline, engine.options, engine.environ)
+
+    result.wall = time.perf_counter() - start
+
+    for stage, status, stderr in zip(pipeline.stages, result.statuses, result.errors):
+        if status and status != -signal.SIGPIPE:  # a stage killed by its reader exiting early is fine
+            message = stderr.decode(pipeline.encoding, errors="replace") or f"exited with status {status}"
+            err = f"{stage_name(stage)}: {message}"
+
+            engine.reporter.error(err)
+            raise Exception(err)
+
+    engine.reporter.result(result)
+
+    return result
+
+
+async def run_graph(graph: Graph, engine: Runtime) -> GraphResult:
+    tasks = tasks_of(graph)
+    order = toposort(tasks)
+    futures: Dict[str, "asyncio.Future[CommandResult]"] = {}
+    timings: Dict[str, Tuple[float, float]] = {}
+    start = time.perf_counter()
+
+    async def run_task(name: str, task: Task) -> CommandResult:
+        results = {need: await futures[need] for need in task.needs}  # a failed need fails the task
+        command = task.command(results) if callable(task.command) else task.command
+        queued_at = time.perf_counter() if engine.tracer else None
+
+        began: List[float] = []
 
-async def exec(command: Command) -> str:
-    print(f"• {command}")
+        async def job() -> CommandResult:
+            began.append(time.perf_counter())
+            return await traced(command, engine, queued_at)
 
-    process_result = await asyncio.create_subprocess_shell(
-        cast(str, command),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+        result = await slotted(command, engine, job)
+        end = time.perf_counter()
+        timings[name] = (began[0] if began else end, end)  # a cached result takes no time
+
+        return result
+
+    for name in order:  # needed tasks come first, their future exists when a dependent awaits it
+        futures[name] = asyncio.ensure_future(run_task(name, tasks[name]))
+
+    try:
+        when = asyncio.FIRST_EXCEPTION if engine.options["fail_fast"] else asyncio.ALL_COMPLETED
+        if futures:  # asyncio.wait refuses an empty graph
+            await asyncio.wait(futures.values(), return_when=when)
+    finally:
+        for future in futures.values():
+            future.cancel()
+        if futures:
+            await asyncio.wait(futures.values())
+
+    for name in order:  # the failure of the first task to fail, not its dependents
+        if not futures[name].cancelled() and futures[name].exception() is not None:
+            raise cast(BaseException, futures[name].exception())
+
+    result = GraphResult(
+        {name: futures[name].result() for name in graph.tasks},
+        critical_path(tasks, timings),
+        {name: end - began for name, (began, end) in timings.items()},
+        time.perf_counter() - start
     )
-    await process_result.wait()
+    engine.reporter.graph(result)
+
+    return result
 
-    stdout, stderr = await process_result.communicate()
-    return_code = process_result.returncode
 
-    stdoutDecoded = stdout.decode('utf-8')
-    stderrDecoded = stderr.decode('utf-8')
+def check(result: CommandResult, reporter: Reporter) -> CommandResult:
+    if result.stderr and result.returncode:
+        err = f"{result.command}: {result.stderr_text}"
+
+        reporter.error(err)
+        raise Exception(err)
 
-    if stderrDecoded and return_code:
-        err = f"{command}: {stderrDecoded}"
+    if not result.stdout and result.returncode:
+        err = f"{result.command}: exited with status {result.returncode}"
 
-        print(err)
+        reporter.error(err)
         raise Exception(err)
 
-    if stdoutDecoded:
-        print(f"➜ {stdoutDecoded}")
+    reporter.result(result)
+
+    return result
+
+
+async def stream(command: Stream, engine: Runtime) -> AsyncIterator[str]:
+    engine.reporter.command(command.command)
+
+    if not engine.executor.capabilities.streaming:
+        raise TypeError('unshell: Stream is not supported by the executor')
+
+    process = await engine.executor.spawn(command.command, engine.options, limit=command.limit)
+    stderr_tail = asyncio.ensure_future(drain(cast(asyncio.StreamReader, process.stderr), command.limit))
+
+    return Streamed(process, stderr_tail, read_stream(command, process, stderr_tail, engine.reporter))
+
+
+class Streamed(AsyncIterator[str]):
+    """Output of a Stream, its process runs from the yield on
+
+    `aclose()` it, or use `async with`, to kill the process once the output is no longer needed,
+    the engine does it anyway when the script ends, whether it started reading or not.
+    """
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        stderr_tail: "asyncio.Future[bytes]",
+        chunks: AsyncGenerator[str, None]
+    ) -> None:
+        self.process = process
+        self._stderr_tail = stderr_tail
+        self._chunks = chunks
+
+    async def __anext__(self) -> str:
+        return await self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        await self._chunks.aclose()  # a generator never started skips its finally, hence the kill below
+        self._stderr_tail.cancel()
+        if self.process.returncode is None:
+            signal_group(self.process, signal.SIGKILL)
+            await self.process.wait()
+
+    async def __aenter__(self) -> "Streamed":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+async def read_stream(
+    command: Stream,
+    process: asyncio.subprocess.Process,
+    stderr_tail: "asyncio.Future[bytes]",
+    reporter: Reporter
+) -> AsyncGenerator[str, None]:
+    stdout = cast(asyncio.StreamReader, process.stdout)
+    decoder = codecs.getincrementaldecoder(command.encoding)(errors="replace")
+
+    try:
+        while True:
+            if command.chunk_size:
+                chunk = await stdout.read(command.chunk_size)
+            else:
+                chunk = await read_line(stdout)
+
+            if not chunk:
+                break
+
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+        return_code = await process.wait()
+        stderrDecoded = (await stderr_tail).decode(command.encoding, errors="replace")
+
+        if stderrDecoded and return_code:
+            err = f"{command.command}: {stderrDecoded}"
+
+            reporter.error(err)
+            raise Exception(err)
+    finally:
+        stderr_tail.cancel()
+        if process.returncode is None:  # the script stopped reading early
+            signal_group(process, signal.SIGKILL)
+            await process.wait()
+
+
+async def read_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as err:  # last line without newline
+        return err.partial
+    except asyncio.LimitOverrunError as err:  # line longer than the buffer, hand it over in pieces
+        return await reader.read(err.consumed)
+
+
+async def drain(reader: asyncio.StreamReader, limit: int) -> bytes:
+    tail = bytearray()
+
+    while True:
+        chunk = await reader.read(limit)
+        if not chunk:
+            return bytes(tail)
+
+        tail += chunk
+        del tail[:-limit]
+
+
+def describe(command: Command) -> str:
+    if isinstance(command, (list, Gather, AsCompleted)):
+        commands = command if isinstance(command, list) else command.commands
+        return f"[{len(commands)} commands]"
+
+    if isinstance(command, Stream):
+        return command.command
+
+    if isinstance(command, Pipeline):
+        return " | ".join(stage_name(stage) for stage in command.stages)
+
+    if isinstance(command, Graph):
+        return f"[graph of {len(command.tasks)} tasks]"
+
+    if isinstance(command, Compute):
+        return getattr(command.function, "__name__", repr(command.function))
+
+    return to_shell(command)
 
-        return stdoutDecoded
 
-    raise Exception("unshell: something went wrong")
+def step_generator(send: Send, value: YieldResult) -> Tuple[bool, Any]:
+    """Resume a generator, StopIteration can not cross a future so it is returned"""
+    try:
+        return False, send(value)
+    except StopIteration as stop:
+        return True, stop
 
 
 def is_generator(fn: Any) -> bool:
@@ -109,5 +649,5 @@ def is_async_generator(fn: Any) -> bool:
     return inspect.isasyncgenfunction(fn)
 
 
-def isValidCmd(cmd: Union[str, List[str]]) -> bool:
+def isValidCmd(cmd: Command) -> bool:
     return bool(cmd)
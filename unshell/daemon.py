@@ -0,0 +1,168 @@
+from typing import Any, Dict, Optional, Tuple, cast
+from types import CodeType, ModuleType
+from .type import Options, Script
+from .core import Runtime, defaultOptions
+from .client import encode
+from .reporter import BufferedReporter, excerpt
+from .result import CommandResult
+from .scheduler import Scheduler
+
+import os
+import sys
+import json
+import socket
+import asyncio
+from contextlib import suppress
+
+
+class ConnectionReporter(BufferedReporter):
+    """The historical unshell output, sent to the client of a script in batches"""
+
+    def __init__(self, writer: asyncio.StreamWriter, max_output: Optional[int] = None) -> None:
+        super().__init__(max_output=max_output)
+        self.writer = writer
+
+    def command(self, command: str) -> None:
+        self.write(f"• {command}")
+
+    def result(self, result: CommandResult) -> None:
+        if result.stdout:
+            self.write(f"➜ {excerpt(result, self.max_output)}")
+
+    def error(self, message: str) -> None:
+        self.write(message)
+
+    def flush(self) -> None:
+        self._scheduled = False
+        if not self._lines or self.writer.is_closing():
+            return
+
+        lines, self._lines = self._lines, []
+        self.writer.write(encode({"out": "".join(f"{line}\n" for line in lines)}))
+
+
+class Daemon:
+    """Warm unshell process running the scripts submitted on a unix socket, many at once on its loop
+
+    Scripts get the env (as is, not over the daemon one) and cwd of their client,
+    their commands share one `concurrency` budget.
+    Their Python code runs in the daemon process: a blocking sync script holds up the others.
+    """
+
+    def __init__(self, path: str, opt: Optional[Options] = None) -> None:
+        self.path = path
+        self.options: Options = {**defaultOptions, **(opt or {})}
+        self.scheduler = Scheduler(self.options["concurrency"])
+        self.scripts: Dict[str, Tuple[Tuple[int, int], CodeType]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        private_dir(os.path.dirname(self.path) or ".")
+        remove_stale_socket(self.path)
+
+        umask = os.umask(0o177)  # only the owner may submit scripts
+        try:
+            # a request line carries the whole client environment, it can be larger than the default 64 KiB
+            self.server = await asyncio.start_unix_server(self.handle, path=self.path, limit=sys.maxsize)
+        finally:
+            os.umask(umask)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await cast(asyncio.AbstractServer, self.server).serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        error = None
+        try:
+            request = json.loads(await reader.readline())
+            await self.run(request, reader, writer)
+        except Exception as err:
+            error = str(err)
+
+        with suppress(ConnectionError):
+            writer.write(encode({"exit": 0 if error is None else 1, "error": error}))
+            await writer.drain()
+            writer.close()
+
+    async def run(self, request: Dict[str, Any], reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Any:
+        script = self.load(request["script"])
+        engine = Runtime({
+            **self.options,
+            "env": request["env"],
+            "inherit_env": False,  # variables the client unset stay unset
+            "cwd": request["cwd"],
+            "reporter": ConnectionReporter(writer, self.options["max_output"]),
+        })
+        engine.scheduler = self.scheduler
+
+        task = asyncio.ensure_future(engine.run(script, *request["args"]))
+        hangup = asyncio.ensure_future(reader.read())  # the client sends nothing more until it goes away
+        try:
+            await asyncio.wait([task, hangup], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            hangup.cancel()
+            if not task.done():  # the client is gone, kill its commands
+                task.cancel()
+                with suppress(BaseException):
+                    await task
+            await engine.aclose()
+
+        return task.result()
+
+    def load(self, path: str) -> Script:
+        """A fresh module per run, the script is only compiled again once changed"""
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+            cached = self.scripts.get(path)
+            if cached is None or cached[0] != version:
+                with open(path, "rb") as file:
+                    cached = self.scripts[path] = (version, compile(file.read(), path, "exec", dont_inherit=True))
+
+            module = ModuleType("script")
+            module.__file__ = path
+            exec(cached[1], module.__dict__)
+
+            return cast(Script, module.script)
+        except Exception:
+            raise Exception("unshell: Invalid script or script path")
+
+
+def private_dir(path: str) -> None:
+    """Create the directory of the socket for its user only, refuse one another user could swap the socket in"""
+    if not os.path.isdir(path):
+        os.makedirs(path, mode=0o700)
+
+    owner = os.stat(path).st_uid
+    if owner not in (0, os.getuid()):
+        raise Exception(f"unshell: {path} belongs to another user, set UNSHELL_SOCKET to a directory of yours")
+
+
+def remove_stale_socket(path: str) -> None:
+    """Remove the socket of a daemon which did not shut down cleanly, refuse to replace a live one"""
+    if not os.path.exists(path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+
+    raise Exception(f"unshell: a daemon is already listening on {path}")
+
+
+def serve(path: str, opt: Optional[Options] = None) -> None:
+    asyncio.run(Daemon(path, opt).serve_forever())
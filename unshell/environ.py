@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from .type import Options
+from .command import Cmd, SingleCommand, to_argv, to_shell
+
+import os
+import sys
+import shlex
+
+# subprocess applies umask= itself from python 3.9, a preexec_fn would disable its vfork/posix_spawn path
+UMASK_KWARG = sys.version_info >= (3, 9)
+
+# ulimit flag and unit of each name of the "limits" option and Cmd field
+ULIMITS = {
+    "as": ("-v", 1024),  # bytes of address space, ulimit counts KiB
+    "cpu": ("-t", 1),  # seconds of CPU time
+    "nofile": ("-n", 1),  # open file descriptors
+}
+
+
+class Environ:
+    """Environment of the children of an engine: os.environ with the "env" option on top
+
+    The merged block is built once, commands carrying their own env only copy it for themselves.
+    None means the children inherit os.environ untouched, which costs no copy at all.
+    With the "inherit_env" option off, "env" is the whole environment, e.g. the one of a daemon client.
+    """
+
+    def __init__(self) -> None:
+        self._source: Optional[Mapping[str, str]] = None
+        self._environ: Optional[Dict[str, str]] = None
+
+    def base(self, opt: Options) -> Optional[Dict[str, str]]:
+        env = opt["env"]
+
+        if env is not self._source:
+            self._source = env
+            if not opt.get("inherit_env", True):
+                self._environ = dict(env)
+            else:
+                self._environ = None if not env or env is os.environ else {**os.environ, **env}
+
+        return self._environ
+
+    def of(self, command: SingleCommand, opt: Options) -> Optional[Dict[str, str]]:
+        base = self.base(opt)
+
+        if not isinstance(command, Cmd) or not command.env:
+            return base
+
+        return {**(os.environ if base is None else base), **command.env}
+
+
+def settings(command: SingleCommand, opt: Options) -> Tuple[Optional[str], Optional[int]]:
+    """cwd and umask of a command, the command ones win over the engine options"""
+    cwd = opt["cwd"]
+    umask = opt["umask"]
+
+    if isinstance(command, Cmd):
+        cwd = command.cwd or cwd
+        umask = umask if command.umask is None else command.umask
+
+    return cwd, umask
+
+
+def limits_of(command: SingleCommand, opt: Options) -> Dict[str, int]:
+    """Resource limits of a command, the command ones win over the engine option"""
+    limits = {**opt.get("limits", {}), **((command.limits or {}) if isinstance(command, Cmd) else {})}
+
+    for name, value in limits.items():
+        if name not in ULIMITS:
+            raise ValueError(f"unshell: unknown limit {name}, expected one of {', '.join(ULIMITS)}")
+        if value < 1:
+            raise ValueError(f"unshell: limit {name} must be positive, got {value}")
+
+    return limits
+
+
+def process_kwargs(command: SingleCommand, opt: Options, environ: Environ) -> Dict[str, Any]:
+    """Keyword arguments of asyncio.create_subprocess_* applying env, cwd and umask"""
+    kwargs: Dict[str, Any] = {}
+    env = environ.of(command, opt)
+    cwd, umask = settings(command, opt)
+
+    if env is not None:
+        kwargs["env"] = env
+    if cwd:
+        kwargs["cwd"] = cwd
+    if umask is not None and UMASK_KWARG:
+        kwargs["umask"] = umask
+
+    return kwargs
+
+
+def child_prelude(command: SingleCommand, opt: Options) -> str:
+    """Shell statements applying what spawning can not: the limits, and the umask before python 3.9"""
+    # a limit the shell can not set fails the command rather than letting it run without, units are rounded up
+    statements = [
+        f"ulimit {ULIMITS[name][0]} {-(-value // ULIMITS[name][1])} || exit 126"
+        for name, value in limits_of(command, opt).items()
+    ]
+    _, umask = settings(command, opt)
+
+    if umask is not None and not UMASK_KWARG:
+        statements.append(f"umask {umask:03o}")
+
+    return "".join(f"{statement}\n" for statement in statements)
+
+
+def command_line(command: SingleCommand, opt: Options) -> Union[str, List[str]]:
+    """What to spawn for a command: its argv, or a /bin/sh script, with the child prelude in front
+
+    A command with a prelude and no need for a shell goes through one that execs it, keeping its pid.
+    """
+    argv = to_argv(command, opt["shell"])
+    prelude = child_prelude(command, opt)
+
+    if argv is None:
+        return prelude + to_shell(command)
+    if prelude:
+        return ["/bin/sh", "-c", f'{prelude}exec "$@"', "sh", *argv]
+
+    return argv
+
+
+def shell_prelude(command: SingleCommand, opt: Options) -> str:
+    """Shell statements applying the command env, cwd and umask, for executors reusing a shell"""
+    statements = []
+    cwd, umask = settings(command, opt)
+
+    if isinstance(command, Cmd) and command.env:
+        statements += [f"export {name}={shlex.quote(value)}" for name, value in command.env.items()]
+    if cwd:
+        statements.append(f"cd {shlex.quote(cwd)} || exit")
+    if umask is not None:
+        statements.append(f"umask {umask:03o}")
+
+    return "".join(f"{statement}\n" for statement in statements)
@@ -0,0 +1,189 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Protocol, Union, cast
+from .type import Options
+from .command import SingleCommand, to_shell
+from .environ import Environ, command_line, process_kwargs
+from .result import CommandResult
+from .spill import SpilledResult, communicate
+from .accounting import AccountedProcess
+
+import os
+import signal
+import asyncio
+from functools import partial
+
+
+class Capabilities(NamedTuple):
+    streaming: bool = False  # can open a process for Stream
+    argv: bool = False  # runs argv commands without a shell
+    shell: bool = True  # runs commands needing /bin/sh
+
+
+class Executor(Protocol):
+    """Backend running the commands of an engine, picked with the "executor" option"""
+    capabilities: Capabilities
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        ...
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class SubprocessExecutor:
+    """Spawn a process per command, straight through exec when it does not need /bin/sh
+
+    With the "accounting" option, processes are reaped with wait4 to get the resources they used.
+    """
+    capabilities = Capabilities(streaming=True, argv=True, shell=True)
+
+    def __init__(self) -> None:
+        self.environ = Environ()
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        try:
+            process = await self.spawn(command, opt)
+        except FileNotFoundError as err:  # direct exec of a missing program, report it like the shell would
+            return CommandResult(to_shell(command), 127, stderr=f"{err.strerror}: {err.filename}".encode())
+
+        try:
+            # communicate drains both pipes while waiting, so a chatty child can not fill them and hang
+            if opt["spill"] is None:
+                stdout, stderr = await process.communicate()
+            else:
+                output, stderr = await communicate(process, opt["spill"], opt["spill_dir"])
+                if not isinstance(output, bytes):
+                    # quacks like a CommandResult, without a str value hiding the output from str functions
+                    spilled = SpilledResult(to_shell(command), process.returncode, output, stderr, process.pid)
+                    return account(cast(CommandResult, spilled), process)
+                stdout = output
+        except asyncio.CancelledError:  # timed out, or a sibling failed
+            await terminate(process, opt["kill_grace"])
+            raise
+
+        return account(CommandResult(to_shell(command), process.returncode, stdout, stderr, process.pid), process)
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        line = command_line(command, opt)
+        # a session of its own makes the command and everything it starts killable as one group
+        kwargs = {"start_new_session": True, **process_kwargs(command, opt, self.environ), **kwargs}
+
+        if opt.get("accounting"):  # quacks like an asyncio process
+            process = await AccountedProcess.start(line, **kwargs)
+            return cast(asyncio.subprocess.Process, process)
+
+        if isinstance(line, str):
+            return await asyncio.create_subprocess_shell(
+                line,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **kwargs
+            )
+
+        return await asyncio.create_subprocess_exec(
+            *line,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **kwargs
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+class DryRunExecutor:
+    """Record commands instead of running them, answering with canned stdout (empty by default)"""
+    capabilities = Capabilities(streaming=False, argv=True, shell=True)
+
+    def __init__(self, outputs: Optional[Dict[str, str]] = None) -> None:
+        self.outputs = outputs or {}
+        self.commands: List[str] = []
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        shell_command = to_shell(command)
+        self.commands.append(shell_command)
+
+        return CommandResult(shell_command, 0, self.outputs.get(shell_command, "").encode())
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        raise TypeError("unshell: dry-run executor can not spawn processes")
+
+    async def close(self) -> None:
+        pass
+
+
+def account(result: CommandResult, process: Union[asyncio.subprocess.Process, AccountedProcess]) -> CommandResult:
+    """Attach what an accounted process used to its result"""
+    if isinstance(process, AccountedProcess) and process.usage is not None:
+        result.usage = process.usage
+        result.user = process.usage.user
+        result.sys = process.usage.sys
+
+    return result
+
+
+def signal_group(process: asyncio.subprocess.Process, sig: int) -> None:
+    """Signal the process group of a command started in its own session"""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:  # the whole group is already gone
+        pass
+
+
+async def terminate(process: asyncio.subprocess.Process, grace: float) -> None:
+    """SIGTERM the command process group, SIGKILL it if it is still there after `grace` seconds"""
+    signal_group(process, signal.SIGTERM)
+
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        pass
+
+    signal_group(process, signal.SIGKILL)  # also reaps children which outlived the command
+    await process.wait()
+
+
+def pool_executor(opt: Options) -> Executor:
+    from .pool import ShellPool
+
+    return ShellPool(**{"env": Environ().base(opt), "cwd": opt["cwd"], **opt["pool"]})
+
+
+def remote_executor(opt: Options) -> Executor:
+    from .remote import RemoteExecutor
+
+    return RemoteExecutor(**{"token": os.environ.get("UNSHELL_AGENT_TOKEN"), **opt["remote"]})
+
+
+def cassette_executor(opt: Options, mode: str) -> Executor:
+    from .cassette import RecordingExecutor, ReplayExecutor
+
+    if not opt.get("cassette"):
+        raise ValueError(f"unshell: the {mode} executor needs a cassette path")
+
+    return RecordingExecutor(opt["cassette"]) if mode == "record" else ReplayExecutor(opt["cassette"])
+
+
+executors: Dict[str, Callable[[Options], Executor]] = {
+    "subprocess": lambda opt: SubprocessExecutor(),
+    "pool": pool_executor,
+    "remote": remote_executor,
+    "record": partial(cassette_executor, mode="record"),
+    "replay": partial(cassette_executor, mode="replay"),
+    "dry-run": lambda opt: DryRunExecutor(),
+}
+
+
+def resolve_executor(opt: Options) -> Executor:
+    executor = opt["executor"]
+
+    if not isinstance(executor, str):  # an executor instance
+        return executor
+
+    factory = executors.get(executor)
+    if factory is None:
+        raise ValueError(f"unshell: unknown executor {executor}, expected one of {', '.join(executors)}")
+
+    return factory(opt)
@@ -0,0 +1,64 @@
+from typing import Dict, List, Tuple
+from .command import Graph, Task, task_of
+
+
+class GraphResult(Dict[str, object]):
+    """Result of each task of a Graph by name, with the chain of tasks which set the run duration
+
+    durations are the seconds each task ran, wall the seconds the whole graph took.
+    """
+
+    def __init__(self, results: Dict[str, object], critical_path: List[str], durations: Dict[str, float], wall: float):
+        super().__init__(results)
+        self.critical_path = critical_path
+        self.durations = durations
+        self.wall = wall
+
+    @property
+    def critical_time(self) -> float:
+        return sum(self.durations[name] for name in self.critical_path)
+
+
+def tasks_of(graph: Graph) -> Dict[str, Task]:
+    return {name: task_of(task) for name, task in graph.tasks.items()}
+
+
+def toposort(tasks: Dict[str, Task]) -> List[str]:
+    """Task names, each one after the tasks it needs, raise on unknown tasks and cycles"""
+    for name, task in tasks.items():
+        for need in task.needs:
+            if need not in tasks:
+                raise ValueError(f"unshell: task {name} needs unknown task {need}")
+
+    waiting = {name: len(set(task.needs)) for name, task in tasks.items()}
+    dependents: Dict[str, List[str]] = {name: [] for name in tasks}
+    for name, task in tasks.items():
+        for need in set(task.needs):
+            dependents[need].append(name)
+
+    order = [name for name, count in waiting.items() if count == 0]
+    for name in order:  # grows while iterating
+        for dependent in dependents[name]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                order.append(dependent)
+
+    if len(order) < len(tasks):
+        cycle = sorted(name for name, count in waiting.items() if count)
+        raise ValueError(f"unshell: tasks {', '.join(cycle)} depend on each other")
+
+    return order
+
+
+def critical_path(tasks: Dict[str, Task], timings: Dict[str, Tuple[float, float]]) -> List[str]:
+    """Walk back from the task finishing last through the needed task finishing last"""
+    if not timings:
+        return []
+
+    name = max(timings, key=lambda name: timings[name][1])
+    path = [name]
+    while tasks[name].needs:
+        name = max(tasks[name].needs, key=lambda need: timings[need][1])
+        path.append(name)
+
+    return path[::-1]
@@ -0,0 +1,67 @@
+from typing import Mapping, Optional
+from types import CodeType, ModuleType
+
+import os
+import struct
+import marshal
+import hashlib
+import importlib.util
+
+# python bytecode version, mtime and size of the script the cached code was compiled from
+HEADER = struct.Struct("<4sqq")
+
+
+def cache_dir(env: Mapping[str, str]) -> str:
+    cache_home = env.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+
+    return env.get("UNSHELL_CACHE_DIR") or os.path.join(cache_home, "unshell")
+
+
+def load_script_module(path: str, cache: Optional[str] = None) -> ModuleType:
+    """Execute a script file as a module, with its compiled code kept in the `cache` directory when given"""
+    spec = importlib.util.spec_from_file_location("script", path)
+    if spec is None:
+        raise TypeError("ModuleSpec is None")
+    if spec.loader is None:
+        raise TypeError("Loader is None")
+
+    module = importlib.util.module_from_spec(spec)
+    if cache is None:
+        spec.loader.exec_module(module)
+    else:
+        exec(cached_code(path, cache), module.__dict__)
+
+    return module
+
+
+def cached_code(path: str, cache: str) -> CodeType:
+    """Compiled code of a script, only compiled again once the script changed
+
+    Unlike __pycache__, it works for scripts in read-only directories and under PYTHONDONTWRITEBYTECODE.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    header = HEADER.pack(importlib.util.MAGIC_NUMBER, stat.st_mtime_ns, stat.st_size)
+    entry = os.path.join(cache, hashlib.sha1(path.encode()).hexdigest() + ".pyc")
+
+    try:
+        with open(entry, "rb") as file:
+            data = file.read()
+        if data[:HEADER.size] == header:
+            return marshal.loads(data[HEADER.size:])
+    except (OSError, ValueError, EOFError):  # no entry yet or a corrupted one, compile again
+        pass
+
+    with open(path, "rb") as file:
+        code = compile(file.read(), path, "exec", dont_inherit=True)
+
+    try:
+        os.makedirs(cache, exist_ok=True)
+        temporary = f"{entry}.{os.getpid()}"
+        with open(temporary, "wb") as file:
+            file.write(header + marshal.dumps(code))
+        os.replace(temporary, entry)  # concurrent runs never read a partial entry
+    except OSError:  # an unwritable cache only costs the compilation
+        pass
+
+    return code
@@ -0,0 +1,197 @@
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar, cast
+from .type import Options
+from .command import Pipeline, SingleCommand, to_shell, stage_name
+from .environ import Environ, command_line, process_kwargs
+from .executor import terminate
+from .result import CommandResult
+
+import os
+import asyncio
+import threading
+from contextlib import suppress
+
+T = TypeVar("T")
+
+
+class PipelineResult(CommandResult):
+    """Result of the last stage of a pipeline, with the exit status of every stage (0 for function stages)"""
+    statuses: List[Optional[int]]
+    errors: List[bytes]
+
+    def __new__(
+        cls,
+        command: str,
+        statuses: List[Optional[int]],
+        errors: List[bytes],
+        stdout: bytes
+    ) -> "PipelineResult":
+        self = cast(PipelineResult, super().__new__(cls, command, statuses[-1], stdout, errors[-1]))
+        self.statuses = statuses
+        self.errors = errors
+
+        return self
+
+    def __reduce__(self) -> Any:
+        return type(self), (self.command, self.statuses, self.errors, self.stdout), {"usage": self.usage}
+
+
+async def run_pipeline(pipeline: Pipeline, opt: Options, environ: Environ) -> PipelineResult:
+    """Start every stage at once, each one reading the previous one output straight from its fd"""
+    stages = list(pipeline.stages)
+    processes: List[Optional[asyncio.subprocess.Process]] = []
+    functions: List["asyncio.Future[List[str]]"] = []
+    fds: List[int] = []
+    read_fd: Optional[int] = None
+
+    try:
+        for index, stage in enumerate(stages):
+            last = index == len(stages) - 1
+            write_fd = None
+            if not last:
+                read_next, write_fd = os.pipe()
+                fds += [read_next, write_fd]
+
+            if callable(stage):
+                hand_over(fds, read_fd, write_fd)  # the thread closes them when done
+                functions.append(in_thread(run_function, stage, read_fd, write_fd, pipeline.encoding))
+                processes.append(None)
+            else:
+                processes.append(await spawn_stage(stage, read_fd, write_fd, opt, environ))
+                close_fds(fds, read_fd, write_fd)  # the child has its own copies now
+
+            read_fd = None if last else read_next
+
+        return await collect(pipeline, processes, functions)
+    except BaseException:
+        close_fds(fds, *fds)
+        await asyncio.gather(*[
+            terminate(process, opt["kill_grace"]) for process in processes
+            if process is not None and process.returncode is None
+        ])
+        raise
+
+
+async def spawn_stage(
+    stage: SingleCommand,
+    read_fd: Optional[int],
+    write_fd: Optional[int],
+    opt: Options,
+    environ: Environ
+) -> asyncio.subprocess.Process:
+    line = command_line(stage, opt)
+    # the stage itself may need a shell, the pipeline does not
+    argv = ["/bin/sh", "-c", line] if isinstance(line, str) else line
+
+    try:
+        return await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.DEVNULL if read_fd is None else read_fd,
+            stdout=asyncio.subprocess.PIPE if write_fd is None else write_fd,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            **process_kwargs(stage, opt, environ)
+        )
+    except FileNotFoundError as err:
+        raise Exception(f"{to_shell(stage)}: {err.strerror}: {err.filename}")
+
+
+async def collect(
+    pipeline: Pipeline,
+    processes: List[Optional[asyncio.subprocess.Process]],
+    functions: List["asyncio.Future[List[str]]"]
+) -> PipelineResult:
+    last = processes[-1]
+
+    async def read(stream: Any) -> bytes:
+        return cast(bytes, await stream.read())
+
+    # every pipe is drained at once, a stage blocked on a full pipe would never exit
+    stdout, *errors = await asyncio.gather(
+        read(last.stdout) if last is not None else asyncio.sleep(0, b""),
+        *[read(process.stderr) for process in processes if process is not None]
+    )
+    statuses: List[Optional[int]] = [await process.wait() if process is not None else 0 for process in processes]
+    outputs = await asyncio.gather(*functions)
+
+    if last is None:
+        stdout = "".join(outputs[-1]).encode(pipeline.encoding)
+
+    stages_errors = iter(errors)
+    return PipelineResult(
+        " | ".join(stage_name(stage) for stage in pipeline.stages),
+        statuses,
+        [next(stages_errors) if process is not None else b"" for process in processes],
+        stdout,
+    )
+
+
+def run_function(
+    function: Callable[[Iterator[str]], Iterable[str]],
+    read_fd: Optional[int],
+    write_fd: Optional[int],
+    encoding: str
+) -> List[str]:
+    """Run a function stage in its own thread, with blocking reads and writes on the pipes"""
+    source = os.fdopen(read_fd, encoding=encoding, errors="replace") if read_fd is not None else None
+    sink = os.fdopen(write_fd, "w", encoding=encoding) if write_fd is not None else None
+    lines = (line.rstrip("\n") for line in source) if source is not None else cast(Iterator[str], iter(()))
+    collected: List[str] = []
+
+    try:
+        for line in function(lines):
+            if sink is None:
+                collected.append(line + "\n")
+            else:
+                sink.write(line + "\n")
+    except BrokenPipeError:  # the next stage is done reading
+        pass
+    except Exception as err:
+        raise Exception(f"{stage_name(function)}: {err}") from err
+    finally:
+        if source is not None:
+            source.close()
+        if sink is not None:
+            with suppress(BrokenPipeError):
+                sink.close()
+
+    return collected
+
+
+def in_thread(function: Callable[..., T], *args: Any) -> "asyncio.Future[T]":
+    """Run a blocking function on a dedicated thread
+
+    A shared pool could run out of threads while its stages wait on each other.
+    """
+    loop = asyncio.get_event_loop()
+    future: "asyncio.Future[T]" = loop.create_future()
+
+    def settle(result: Tuple[bool, Any]) -> None:
+        if future.done():
+            return
+        if result[0]:
+            future.set_result(result[1])
+        else:
+            future.set_exception(result[1])
+
+    def target() -> None:
+        try:
+            result: Tuple[bool, Any] = (True, function(*args))
+        except BaseException as err:
+            result = (False, err)
+        loop.call_soon_threadsafe(settle, result)
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+
+def hand_over(fds: List[int], *to_hand_over: Optional[int]) -> None:
+    for fd in to_hand_over:
+        if fd is not None and fd in fds:
+            fds.remove(fd)
+
+
+def close_fds(fds: List[int], *to_close: Optional[int]) -> None:
+    for fd in to_close:
+        if fd is not None and fd in fds:
+            fds.remove(fd)
+            os.close(fd)
@@ -0,0 +1,129 @@
+from typing import Any, Dict, List, Optional, Tuple, cast
+from .type import Options
+from .command import SingleCommand, to_shell
+from .environ import limits_of, shell_prelude
+from .executor import Capabilities, signal_group
+from .result import CommandResult
+from .scheduler import Scheduler
+
+import sys
+import signal
+import shlex
+import asyncio
+from uuid import uuid4
+
+
+class ShellWorker:
+    """A long lived /bin/sh fed with commands through its stdin
+
+    Each command runs in a subshell with stdin closed: cd, exports or exit do not leak into
+    the next command, and a command can not read the commands meant for the worker.
+    Output and exit status are framed by a random marker printed after the command.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process) -> None:
+        self.process = process
+        self.uses = 0
+
+    @classmethod
+    async def start(cls, shell: str, env: Optional[Dict[str, str]], cwd: Optional[str]) -> "ShellWorker":
+        process = await asyncio.create_subprocess_exec(
+            shell,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+            start_new_session=True,
+            limit=sys.maxsize,  # framing reads until the marker whatever the output size
+        )
+
+        return cls(process)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def run(self, command: str) -> Tuple[bytes, bytes, int]:
+        self.uses += 1
+        marker = uuid4().hex.encode()
+        stdin = cast(asyncio.StreamWriter, self.process.stdin)
+
+        stdin.write(
+            b"( eval " + shlex.quote(command).encode() + b" ) </dev/null\n"
+            b"printf '\\n%s %d\\n' " + marker + b" $?\n"
+            b"printf '\\n%s\\n' " + marker + b" >&2\n"
+        )
+        await stdin.drain()
+
+        stdout, stderr = await asyncio.gather(
+            cast(asyncio.StreamReader, self.process.stdout).readuntil(b"\n" + marker + b" "),
+            cast(asyncio.StreamReader, self.process.stderr).readuntil(b"\n" + marker + b"\n"),
+        )
+        status = await cast(asyncio.StreamReader, self.process.stdout).readline()
+
+        return stdout[:-len(marker) - 2], stderr[:-len(marker) - 2], int(status)
+
+    async def close(self) -> None:
+        signal_group(self.process, signal.SIGKILL)  # the worker and any command still running in it
+        await self.process.wait()
+
+
+class ShellPool:
+    """Run commands on warm shell workers instead of forking a new /bin/sh each time
+
+    At most `size` workers run at once, a worker is replaced after `max_uses` commands.
+    Commands share the worker process: a command can still alter files, ulimits or
+    signal dispositions seen by the next ones, use the subprocess executor when that matters.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        max_uses: Optional[int] = 1000,
+        shell: str = "/bin/sh",
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[str] = None
+    ) -> None:
+        self.size = size
+        self.max_uses = max_uses
+        self.shell = shell
+        self.env = env
+        self.cwd = cwd
+        self.options: Options = {"cwd": None, "umask": None}
+        self._slots = Scheduler(size)
+        self._idle: List[ShellWorker] = []
+
+    capabilities = Capabilities(streaming=False, argv=False, shell=True)
+
+    async def run(self, command: SingleCommand, opt: Optional[Options] = None) -> CommandResult:
+        if limits_of(command, opt or self.options):  # set by the subprocess executor on a process of their own
+            raise ValueError("unshell: the pool executor can not apply limits, use the subprocess executor")
+
+        await self._slots.acquire()
+
+        try:
+            worker = self._idle.pop() if self._idle else await ShellWorker.start(self.shell, self.env, self.cwd)
+
+            try:
+                script = shell_prelude(command, opt or self.options) + to_shell(command)
+                stdout, stderr, returncode = await worker.run(script)
+            except BaseException:  # unknown worker state, the command may still be running
+                await worker.close()
+                raise
+
+            if not worker.alive or (self.max_uses is not None and worker.uses >= self.max_uses):
+                await worker.close()
+            else:
+                self._idle.append(worker)
+
+            return CommandResult(to_shell(command), returncode, stdout, stderr, worker.process.pid)
+        finally:
+            self._slots.release()
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        raise TypeError("unshell: shell pool executor can not spawn processes")
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*[worker.close() for worker in idle])
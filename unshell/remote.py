@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional
+from .type import Options
+from .command import SingleCommand, to_shell
+from .agent import Address, open_connection, parse_address, to_request
+from .client import encode
+from .executor import Capabilities
+from .result import CommandResult
+from .scheduler import Scheduler
+
+import json
+import base64
+import asyncio
+import itertools
+from contextlib import suppress
+
+
+class AgentConnection:
+    """A connection to one agent, shared by all the commands sent to it and matched to replies by id"""
+
+    def __init__(self, address: str, concurrency: Optional[int], token: Optional[str]) -> None:
+        self.name = address
+        self.address: Address = parse_address(address)
+        self.token = token
+        self.scheduler = Scheduler(concurrency)
+        self.healthy = True
+        self.load = 0  # commands queued or running on the agent
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._replies: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._ids = itertools.count()
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await open_connection(self.address)
+                asyncio.ensure_future(self.listen(reader, self._writer))
+
+    async def listen(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async for line in reader:
+                reply = json.loads(line)
+                future = self._replies.pop(reply.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"unshell: agent {self.name} closed the connection"))
+            self._replies.clear()
+
+    async def request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        await self.connect()
+        writer = self._writer
+        if writer is None:
+            raise ConnectionError(f"unshell: agent {self.name} closed the connection")
+
+        id = next(self._ids)
+        future = self._replies[id] = asyncio.get_running_loop().create_future()
+        writer.write(encode({**message, "id": id, "token": self.token}))
+
+        try:
+            reply = await future
+        except asyncio.CancelledError:  # timed out, or a sibling failed: kill the command on the agent
+            self._replies.pop(id, None)
+            if "run" in message and not writer.is_closing():
+                writer.write(encode({"id": None, "cancel": id, "token": self.token}))
+            raise
+
+        if "error" in reply:
+            raise Exception(reply["error"])
+
+        return reply
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class RemoteExecutor:
+    """Run commands on unshell agents, each one picked by its load among the healthy ones
+
+    Each agent runs at most `concurrency` commands at once. Agents are pinged every `health_interval`
+    seconds: an agent failing to answer within `health_timeout`, or to accept a connection, gets no more
+    commands until it answers again. A command is only sent to another agent when its own was unreachable,
+    never once it may have run.
+    """
+    capabilities = Capabilities(streaming=False, argv=True, shell=True)
+
+    def __init__(
+        self,
+        agents: List[str],
+        concurrency: Optional[int] = 16,
+        token: Optional[str] = None,
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+    ) -> None:
+        if not agents:
+            raise ValueError("unshell: remote executor needs at least one agent")
+
+        self.agents = [AgentConnection(agent, concurrency, token) for agent in agents]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._monitor: Optional["asyncio.Future[None]"] = None
+
+    async def run(self, command: SingleCommand, opt: Options) -> CommandResult:
+        self.watch()
+
+        while True:
+            agent = self.pick(command)
+            agent.load += 1  # before any await, for the commands picking meanwhile
+            try:
+                await agent.connect()
+                break
+            except OSError:
+                agent.healthy = False
+                agent.load -= 1
+
+        try:
+            reply = await agent.scheduler.run(lambda: agent.request({"run": to_request(command, opt)}))
+        finally:
+            agent.load -= 1
+
+        return CommandResult(
+            to_shell(command),
+            reply["returncode"],
+            base64.b64decode(reply["stdout"]),
+            base64.b64decode(reply["stderr"]),
+            reply["pid"],
+        )
+
+    def pick(self, command: SingleCommand) -> AgentConnection:
+        healthy = [agent for agent in self.agents if agent.healthy]
+        if not healthy:
+            raise Exception(f"unshell: no healthy agent to run {to_shell(command)}")
+
+        return min(healthy, key=lambda agent: agent.load / (agent.scheduler.limit or 1))
+
+    def watch(self) -> None:
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.ensure_future(self.monitor())
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*[self.check(agent) for agent in self.agents])
+
+    async def check(self, agent: AgentConnection) -> None:
+        try:
+            await asyncio.wait_for(agent.request({"ping": True}), self.health_timeout)
+            agent.healthy = True
+        except Exception:  # unreachable, too slow or refusing
+            agent.healthy = False
+
+    async def spawn(self, command: SingleCommand, opt: Options, **kwargs: Any) -> asyncio.subprocess.Process:
+        raise TypeError("unshell: remote executor can not spawn local processes")
+
+    async def close(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._monitor
+        for agent in self.agents:
+            await agent.close()
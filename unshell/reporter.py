@@ -0,0 +1,297 @@
+from typing import Any, Callable, Dict, IO, List, Optional
+from .type import Options
+from .result import CommandResult
+from .graph import GraphResult
+
+import sys
+import time
+import queue
+import asyncio
+import threading
+from contextlib import suppress
+
+
+SPILLED_OUTPUT = 1024
+
+
+class Reporter:
+    """Tell the user what the engine runs, picked with the "reporter" option
+
+    Hooks are called on the loop thread and must not block: buffered reporters queue lines
+    and write them in batches, at most once per loop iteration, from a thread of their own.
+    """
+
+    def command(self, command: str) -> None:
+        pass
+
+    def result(self, result: CommandResult) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def summary(self, stats: Dict[str, int]) -> None:
+        """Called once a script is done with its counters, see Runtime.stats"""
+        pass
+
+    def graph(self, result: GraphResult) -> None:
+        """Called once every task of a Graph is done"""
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """Called once the engine is closed, everything reported must be written by then"""
+        self.flush()
+
+
+class QuietReporter(Reporter):
+    """Report nothing, errors are still raised"""
+
+
+class PrintReporter(Reporter):
+    """Print every command and its whole output as it comes, the historical unshell output"""
+
+    def __init__(self, max_output: Optional[int] = None) -> None:
+        self.max_output = max_output
+
+    def command(self, command: str) -> None:
+        print(f"• {command}")
+
+    def result(self, result: CommandResult) -> None:
+        if result.stdout:
+            print(f"➜ {excerpt(result, self.max_output)}")
+
+    def error(self, message: str) -> None:
+        print(message)
+
+    def graph(self, result: GraphResult) -> None:
+        print(f"⏱ {critical_path_line(result)}")
+
+
+class BufferedReporter(Reporter):
+    """Queue lines and write them with a single call once the loop is done with the current callbacks
+
+    While a loop runs, the writes happen on a thread of their own: a slow stream (a pipe to a slow reader,
+    a paused terminal) holds up the output, not the commands. close() waits for the thread to be done.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, max_output: Optional[int] = 1024) -> None:
+        self.stream = stream
+        self.max_output = max_output
+        self._lines: List[str] = []
+        self._scheduled = False
+        self._writer: Optional[Writer] = None
+
+    def write(self, line: str) -> None:
+        self._lines.append(line)
+        self.schedule()
+
+    def graph(self, result: GraphResult) -> None:
+        self.write(f"⏱ {critical_path_line(result)}")
+
+    def summary(self, stats: Dict[str, int]) -> None:
+        saved = ", ".join(f"{count} {name}" for name, count in stats.items() if count)
+        if saved:
+            self.write(f"∑ {saved}")
+
+    def schedule(self) -> None:
+        if self._scheduled:
+            return
+
+        try:
+            asyncio.get_running_loop().call_soon(self.flush)
+            self._scheduled = True
+        except RuntimeError:  # no loop, e.g. reporting after close
+            self.flush()
+
+    def flush(self) -> None:
+        self._scheduled = False
+        if not self._lines:
+            return
+
+        lines, self._lines = self._lines, []
+        self.output("".join(f"{line}\n" for line in lines))
+
+    def output(self, text: str) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:  # no loop to hold up, after what is still queued
+            self.join()
+            self.emit(text)
+            return
+
+        if self._writer is None:
+            self._writer = Writer(self.emit)
+        self._writer.put(text)
+
+    def emit(self, text: str) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def join(self) -> None:
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def close(self) -> None:
+        self.flush()
+        self.join()
+
+
+class Writer:
+    """A thread writing the texts it is given, in order"""
+
+    def __init__(self, emit: Callable[[str], None]) -> None:
+        self.emit = emit
+        self._texts: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self.run, name="unshell-reporter", daemon=True)
+        self._thread.start()
+
+    def put(self, text: str) -> None:
+        self._texts.put(text)
+
+    def run(self) -> None:
+        while True:
+            text = self._texts.get()
+            if text is None:
+                return
+            with suppress(Exception):  # e.g. a closed pipe, the commands go on without output
+                self.emit(text)
+
+    def join(self) -> None:
+        self._texts.put(None)
+        self._thread.join()
+
+
+class PrefixReporter(BufferedReporter):
+    """One line per output line, prefixed with its command, long outputs are truncated"""
+
+    def command(self, command: str) -> None:
+        self.write(f"• {command}")
+
+    def result(self, result: CommandResult) -> None:
+        for line in excerpt(result, self.max_output).splitlines():
+            self.write(f"{result.command} │ {line}")
+
+    def error(self, message: str) -> None:
+        self.write(f"✘ {message}")
+
+
+class JsonReporter(BufferedReporter):
+    """One JSON object per event, for machines"""
+
+    def command(self, command: str) -> None:
+        self.event(event="command", command=command)
+
+    def result(self, result: CommandResult) -> None:
+        self.event(
+            event="result",
+            command=result.command,
+            returncode=result.returncode,
+            pid=result.pid,
+            wall=result.wall,
+            stdout_bytes=len(result.stdout),
+            stdout=excerpt(result, self.max_output),
+            **({} if result.usage is None else {"usage": result.usage._asdict()}),
+        )
+
+    def error(self, message: str) -> None:
+        self.event(event="error", message=message)
+
+    def summary(self, stats: Dict[str, int]) -> None:
+        self.event(event="summary", **stats)
+
+    def graph(self, result: GraphResult) -> None:
+        self.event(event="graph", critical_path=result.critical_path, durations=result.durations, wall=result.wall)
+
+    def event(self, **fields: Any) -> None:
+        import json  # imported by this reporter only, it weighs on the cli startup
+
+        self.write(json.dumps({**fields, "time": time.time()}))
+
+
+class ProgressReporter(BufferedReporter):
+    """Keep a single status line up to date on a terminal, only errors get a line of their own"""
+
+    def __init__(
+        self,
+        stream: Optional[IO[str]] = None,
+        max_output: Optional[int] = 1024,
+        interval: float = 0.1
+    ) -> None:
+        super().__init__(stream, max_output)
+        self.interval = interval
+        self.started = 0
+        self.done = 0
+        self.failed = 0
+        self.last = ""
+        self._drawn_at = 0.0
+
+    def command(self, command: str) -> None:
+        self.started += 1
+        self.last = command
+        self.refresh()
+
+    def result(self, result: CommandResult) -> None:
+        self.done += 1
+        self.refresh()
+
+    def error(self, message: str) -> None:
+        self.done += 1
+        self.failed += 1
+        self.write(f"✘ {message}")
+
+    def refresh(self) -> None:
+        if time.monotonic() - self._drawn_at >= self.interval:
+            self.schedule()
+
+    def flush(self) -> None:
+        self._scheduled = False
+        self._drawn_at = time.monotonic()
+
+        lines, self._lines = self._lines, []
+        status = f"{self.done}/{self.started} done, {self.started - self.done} running, {self.failed} failed"
+        self.output("\r\x1b[2K" + "".join(f"{line}\n" for line in lines) + f"{status} • {self.last}"[:200])
+
+
+def critical_path_line(result: GraphResult) -> str:
+    path = " → ".join(f"{name} {result.durations[name]:.2f}s" for name in result.critical_path)
+
+    return f"critical path {result.critical_time:.2f}s of {result.wall:.2f}s: {path}"
+
+
+def excerpt(result: CommandResult, max_output: Optional[int]) -> str:
+    """Decoded stdout, cut after max_output bytes without decoding the rest"""
+    if max_output is None and result.spilled:  # never print an output too large for memory
+        max_output = SPILLED_OUTPUT
+
+    if max_output is None or len(result.stdout) <= max_output:
+        return result.text
+
+    head = result.stdout[:max_output].decode(result.encoding, errors="ignore")
+    return f"{head}… ({len(result.stdout) - max_output} more bytes)"
+
+
+reporters: Dict[str, Callable[[Options], Reporter]] = {
+    "print": lambda opt: PrintReporter(opt["max_output"]),
+    "quiet": lambda opt: QuietReporter(),
+    "prefixed": lambda opt: PrefixReporter(max_output=opt["max_output"] or 1024),
+    "json": lambda opt: JsonReporter(max_output=opt["max_output"] or 1024),
+    "progress": lambda opt: ProgressReporter(max_output=opt["max_output"] or 1024),
+}
+
+
+def resolve_reporter(opt: Options) -> Reporter:
+    reporter = opt["reporter"]
+
+    if not isinstance(reporter, str):  # a reporter instance
+        return reporter
+
+    factory = reporters.get(reporter)
+    if factory is None:
+        raise ValueError(f"unshell: unknown reporter {reporter}, expected one of {', '.join(reporters)}")
+
+    return factory(opt)
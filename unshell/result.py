@@ -0,0 +1,94 @@
+from typing import Any, NamedTuple, Optional, Tuple
+
+
+class ScriptResult(NamedTuple):
+    """Outcome of one script of a batch, error is set instead of raised"""
+    script: Any
+    args: Tuple[Any, ...]
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Usage(NamedTuple):
+    """Resources used by a command, as reported by wait4 for its process (not its own children)"""
+    user: float  # seconds of CPU in user mode
+    sys: float  # seconds of CPU in kernel mode
+    maxrss: int  # peak resident memory, KiB
+    voluntary_switches: int  # the command waited, e.g. for I/O
+    involuntary_switches: int  # the command was preempted
+
+
+class CommandResult(str):
+    """Outcome of a command: a str of its decoded stdout, as scripts always got, with the raw outputs alongside
+
+    stdout and stderr are the bytes the command wrote. The str value decodes stdout with errors replaced,
+    so a binary output does not fail a script which never reads it, stderr is decoded on first use.
+    Timings are in seconds, user and sys are None when the executor can not measure them.
+    usage holds all the resources the command used, when the "accounting" option is on.
+    """
+    spilled = False  # stdout is in memory, see SpilledResult
+
+    command: str
+    returncode: Optional[int]
+    stdout: bytes
+    stderr: bytes
+    pid: Optional[int]
+    wall: float
+    user: Optional[float]
+    sys: Optional[float]
+    usage: Optional[Usage]
+    encoding: str
+    _stderr_text: Optional[str]
+
+    def __new__(
+        cls,
+        command: str,
+        returncode: Optional[int],
+        stdout: bytes = b"",
+        stderr: bytes = b"",
+        pid: Optional[int] = None,
+        wall: float = 0.0,
+        user: Optional[float] = None,
+        sys: Optional[float] = None,
+        encoding: str = "utf-8"
+    ) -> "CommandResult":
+        self = super().__new__(cls, stdout.decode(encoding, errors="replace"))
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.pid = pid
+        self.wall = wall
+        self.user = user
+        self.sys = sys
+        self.usage = None
+        self.encoding = encoding
+        self._stderr_text = None
+
+        return self
+
+    @property
+    def text(self) -> str:
+        """The decoded stdout as a plain str"""
+        return str.__str__(self)
+
+    @property
+    def stderr_text(self) -> str:
+        if self._stderr_text is None:
+            self._stderr_text = self.stderr.decode(self.encoding, errors="replace")
+        return self._stderr_text
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    def __repr__(self) -> str:
+        return f"CommandResult(command={self.command!r}, returncode={self.returncode!r}, stdout={self.stdout!r})"
+
+    def __reduce__(self) -> Any:  # the str value alone would lose the outputs, e.g. in a process pool
+        fields = (self.command, self.returncode, self.stdout, self.stderr, self.pid, self.wall, self.user, self.sys)
+        return type(self), fields + (self.encoding,), {"usage": self.usage}
@@ -0,0 +1,162 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Iterable, List, Optional, Tuple, TypeVar, cast
+
+import asyncio
+from collections import deque
+
+T = TypeVar("T")
+Job = Callable[[], Awaitable[T]]
+
+
+class Scheduler:
+    """Bound the number of jobs in flight, waiting jobs are dispatched in FIFO order
+
+    A limit of None means no bound at all.
+    """
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        if limit is not None and limit < 1:
+            raise ValueError("unshell: concurrency must be a positive integer")
+
+        self.limit = limit
+        self._free = limit or 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+    async def acquire(self) -> None:
+        if self.limit is None:
+            return
+
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():  # slot handed over right before cancellation
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        if self.limit is None:
+            return
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():  # hand the slot over to the oldest waiter
+                waiter.set_result(None)
+                return
+
+        self._free += 1
+
+    async def run(self, job: Job[T]) -> T:
+        await self.acquire()
+        try:
+            return await job()
+        finally:
+            self.release()
+
+    async def gather(
+        self,
+        jobs: Iterable[Job[T]],
+        limit: Optional[int] = None,
+        fail_fast: bool = True,
+        acquire: bool = True
+    ) -> List[T]:
+        """Run jobs under the scheduler bound (and an extra per call limit), results keep the jobs order
+
+        With fail_fast the first failure cancels the other jobs, otherwise it is raised once all jobs are done.
+        Jobs taking a slot of the scheduler themselves are run with acquire=False, only under the per call limit.
+        """
+        local = Scheduler(limit)
+
+        async def run(job: Job[T]) -> T:
+            return await local.run(lambda: self.run(job) if acquire else job())
+
+        tasks = [asyncio.ensure_future(run(job)) for job in jobs]
+
+        try:
+            if fail_fast:
+                return list(await asyncio.gather(*tasks))
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return cast(List[T], results)
+
+    def as_completed(
+        self,
+        jobs: Iterable[Job[T]],
+        limit: Optional[int] = None,
+        fail_fast: bool = True,
+        acquire: bool = True
+    ) -> "Completed[T]":
+        """(index, result) of each job as soon as it is done, under the same bounds as gather, see Completed
+
+        With fail_fast the first failure is raised when reached, otherwise once the other results are yielded.
+        """
+        local = Scheduler(limit)
+
+        async def run(index: int, job: Job[T]) -> Tuple[int, T]:
+            return index, await local.run(lambda: self.run(job) if acquire else job())
+
+        return Completed([asyncio.ensure_future(run(index, job)) for index, job in enumerate(jobs)], fail_fast)
+
+
+class Completed(AsyncIterator[Tuple[int, T]]):
+    """Results of jobs as they are done, the jobs start right away
+
+    Breaking out of `async for` leaves the other jobs running: `aclose()` it, or use `async with`,
+    to cancel them once their results are no longer needed.
+    """
+
+    def __init__(self, tasks: List["asyncio.Future[Tuple[int, T]]"], fail_fast: bool = True) -> None:
+        self.tasks = tasks
+        self.fail_fast = fail_fast
+        self._done: "asyncio.Queue[asyncio.Future[Tuple[int, T]]]" = asyncio.Queue()
+        self._left = len(tasks)
+        self._error: Optional[BaseException] = None
+
+        for task in tasks:
+            task.add_done_callback(self._done.put_nowait)
+
+    async def __anext__(self) -> Tuple[int, T]:
+        while self._left:
+            task = await self._done.get()
+            self._left -= 1
+            try:
+                return task.result()
+            except Exception as failure:
+                if self.fail_fast:
+                    await self.aclose()
+                    raise
+                self._error = self._error or failure
+
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        self._left = 0
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def __aenter__(self) -> "Completed[T]":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
@@ -0,0 +1,184 @@
+from typing import IO, Any, Iterator, List, Optional, Tuple, Union, cast
+from .result import Usage
+
+import mmap
+import asyncio
+import tempfile
+
+CHUNK = 64 * 1024
+STR_METHODS = frozenset(name for name in vars(str) if not name.startswith("_"))
+
+
+class SpilledResult:
+    """Result of a command whose stdout went over the "spill" threshold, kept in a temporary file
+
+    It has the attributes of a CommandResult, but stdout is a read-only mmap of the file: slicing it gives bytes
+    without reading the rest. Lines, slices, search and `in` work on the mapping and never decode the whole
+    output, indexes are byte offsets. `text`, str() and str methods decode everything, on demand.
+    It is not a str itself, functions taking one (join, re, json...) raise TypeError: pass them `text`.
+    The file is already unlinked, its space is freed once the result is closed or collected.
+    """
+    spilled = True
+
+    def __init__(
+        self,
+        command: str,
+        returncode: Optional[int],
+        file: IO[bytes],
+        stderr: bytes = b"",
+        pid: Optional[int] = None,
+        encoding: str = "utf-8"
+    ) -> None:
+        self.command = command
+        self.returncode = returncode
+        self.stdout = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.stderr = stderr
+        self.pid = pid
+        self.wall = 0.0
+        self.user: Optional[float] = None
+        self.sys: Optional[float] = None
+        self.usage: Optional[Usage] = None
+        self.encoding = encoding
+        self._file = file
+        self._text: Optional[str] = None
+
+    def __getattr__(self, name: str) -> Any:
+        if name in STR_METHODS:  # split, strip... of the decoded stdout
+            return getattr(self.text, name)
+        raise AttributeError(f"'SpilledResult' object has no attribute '{name}'")
+
+    @property
+    def buffer(self) -> memoryview:
+        """The whole output without any copy"""
+        return memoryview(self.stdout)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.stdout[:].decode(self.encoding, errors="replace")
+        return self._text
+
+    @property
+    def stderr_text(self) -> str:
+        return self.stderr.decode(self.encoding, errors="replace")
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    def lines(self, keepends: bool = False) -> Iterator[str]:
+        """Decoded lines, one at a time"""
+        stdout = self.stdout
+        start = 0
+
+        while start < len(stdout):
+            end = stdout.find(b"\n", start)
+            end = len(stdout) if end == -1 else end + 1
+            line = stdout[start:end if keepends else end - (stdout[end - 1:end] == b"\n")]
+            yield line.decode(self.encoding, errors="replace")
+            start = end
+
+    def search(self, needle: Union[str, bytes], start: int = 0) -> int:
+        """Byte offset of the first occurrence of needle from start, -1 when absent"""
+        return self.stdout.find(needle.encode(self.encoding) if isinstance(needle, str) else needle, start)
+
+    def close(self) -> None:
+        self.stdout.close()
+        self._file.close()
+
+    def __enter__(self) -> "SpilledResult":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __reduce__(self) -> Any:
+        raise TypeError("unshell: a spilled result can not be copied, read its text or lines")
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.text, format_spec)
+
+    def __eq__(self, other: Any) -> bool:
+        return self.text == other
+
+    def __hash__(self) -> int:
+        return hash(self.text)
+
+    def __bool__(self) -> bool:
+        return len(self.stdout) > 0
+
+    def __add__(self, other: str) -> str:
+        return self.text + other
+
+    def __radd__(self, other: str) -> str:
+        return other + self.text
+
+    def __repr__(self) -> str:
+        return f"SpilledResult(command={self.command!r}, returncode={self.returncode!r}, bytes={len(self.stdout)})"
+
+    def __len__(self) -> int:
+        return len(self.stdout)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.lines(keepends=True)
+
+    def __contains__(self, item: object) -> bool:
+        return self.search(cast(Union[str, bytes], item)) != -1
+
+    def __getitem__(self, key: Any) -> str:  # an int or a slice of byte offsets
+        if isinstance(key, int):
+            key = slice(key, key + 1 or None)
+
+        return self.stdout[key].decode(self.encoding, errors="replace")
+
+
+async def read_output(reader: asyncio.StreamReader, threshold: int, dir: Optional[str]) -> Union[bytes, IO[bytes]]:
+    """Read a whole output, in memory up to threshold bytes, in a temporary file past it"""
+    chunks: List[bytes] = []
+    size = 0
+    file: Optional[IO[bytes]] = None
+
+    try:
+        while True:
+            chunk = await reader.read(CHUNK)
+            if not chunk:
+                break
+
+            if file is not None:
+                file.write(chunk)
+                continue
+
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > threshold:
+                file = tempfile.TemporaryFile(dir=dir)
+                file.writelines(chunks)
+                chunks = []
+    except BaseException:
+        if file is not None:
+            file.close()
+        raise
+
+    if file is None:
+        return b"".join(chunks)
+
+    file.flush()
+    return file
+
+
+async def communicate(
+    process: asyncio.subprocess.Process,
+    threshold: int,
+    dir: Optional[str]
+) -> Tuple[Union[bytes, IO[bytes]], bytes]:
+    """Like Process.communicate, with stdout spilled to disk past threshold bytes"""
+    stdout, stderr = await asyncio.gather(
+        read_output(cast(asyncio.StreamReader, process.stdout), threshold, dir),
+        cast(asyncio.StreamReader, process.stderr).read(),
+    )
+    await process.wait()
+
+    return stdout, stderr
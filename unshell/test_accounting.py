@@ -0,0 +1,215 @@
+# type: ignore
+
+# framework
+import io
+import os
+import time
+import pytest
+import signal
+import asyncio
+import subprocess
+# under test
+from .core import Unshell
+from .command import Cmd, Stream
+from .reporter import PrefixReporter
+from .result import Usage
+from .accounting import AccountedProcess, ScriptUsage
+
+
+def test_engine_should_attach_usage_to_results():
+    # given
+    outputs = []
+
+    def script():
+        outputs.append((yield "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done; echo done"))
+
+    # when
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    result, = outputs
+    assert result == "done\n"
+    assert result.usage.user + result.usage.sys > 0
+    assert result.usage.maxrss > 0
+    assert result.user == result.usage.user
+    assert result.sys == result.usage.sys
+
+
+def test_engine_should_leave_usage_unset_without_accounting():
+    # given
+    outputs = []
+
+    def script():
+        outputs.append((yield "echo hi"))
+
+    # when
+    with Unshell({"reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert outputs[0].usage is None
+    assert outputs[0].user is None
+
+
+def test_engine_should_keep_exit_statuses_with_accounting():
+    # given
+    def script():
+        yield Cmd(["sh", "-c", "exit 3"])
+
+    # then
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="exited with status 3"):
+            engine(script)
+
+
+def test_engine_should_report_missing_programs_with_accounting():
+    # given
+    def script():
+        yield Cmd(["unshell-no-such-program"])
+
+    # then
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="No such file"):
+            engine(script)
+
+
+def test_engine_should_summarize_usage_per_script():
+    # given
+    stream = io.StringIO()
+
+    def script():
+        yield ["echo a", "echo b"]
+
+    # when
+    with Unshell({"accounting": True, "reporter": PrefixReporter(stream)}) as engine:
+        engine(script)
+
+    # then
+    output = stream.getvalue()
+    assert "max_rss_kib" in output
+    assert "context_switches" in output
+
+
+def test_script_usage_should_sum_times_and_keep_peak_memory():
+    # given
+    usage = ScriptUsage()
+
+    # when
+    usage.add(Usage(0.5, 0.25, 100, 2, 1))
+    usage.add(Usage(0.25, 0.0, 300, 1, 0))
+
+    # then
+    assert usage.summary() == {"cpu_user_ms": 750, "cpu_sys_ms": 250, "max_rss_kib": 300, "context_switches": 4}
+
+
+def test_engine_should_stream_with_accounting():
+    # given
+    lines = []
+
+    async def script():
+        async for line in (yield Stream("seq 1 3")):
+            lines.append(line)
+
+    # when
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert lines == ["1\n", "2\n", "3\n"]
+
+
+def test_engine_should_kill_accounted_commands_on_timeout():
+    # given
+    def script():
+        yield "sleep 5"
+
+    # then
+    with Unshell({"accounting": True, "timeout": 0.2, "kill_grace": 0.1, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="timed out"):
+            engine(script)
+
+
+def test_engine_should_apply_limits_in_the_child():
+    # given
+    outputs = []
+
+    def script():
+        outputs.append((yield "ulimit -n"))
+        outputs.append((yield Cmd("ulimit -t", limits={"cpu": 7})))
+
+    # when
+    with Unshell({"limits": {"nofile": 32}, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == ["32\n", "7\n"]
+
+
+def test_engine_should_fail_commands_whose_limits_can_not_be_set():
+    # given
+    def script():
+        yield Cmd(["sh", "-c", "ulimit -n"], limits={"nofile": 10 ** 12})
+
+    # then
+    with Unshell({"reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="ulimit"):
+            engine(script)
+
+
+def test_engine_should_kill_commands_over_their_cpu_limit():
+    # given
+    def script():
+        yield Cmd("while :; do :; done", limits={"cpu": 1}, shell=True)
+
+    # then
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match=f"exited with status -({signal.SIGKILL}|{signal.SIGXCPU})"):
+            engine(script)
+
+
+def test_engine_should_reap_accounted_commands_without_pidfds(monkeypatch):
+    # given
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    outputs = []
+
+    def script():
+        outputs.extend((yield ["sleep 0.1; echo a", "echo b"]))
+
+    # when
+    with Unshell({"accounting": True, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == ["a\n", "b\n"]
+    assert all(result.usage is not None for result in outputs)
+
+
+def test_accounted_process_should_kill_a_child_spawned_after_cancellation(monkeypatch):
+    # given
+    spawned = []
+
+    class SlowPopen(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.2)
+            super().__init__(*args, **kwargs)
+            spawned.append(self)
+
+    monkeypatch.setattr(subprocess, "Popen", SlowPopen)
+
+    async def main():
+        start = asyncio.ensure_future(AccountedProcess.start(["sleep", "30"], start_new_session=True))
+        await asyncio.sleep(0.05)
+        start.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await start
+        for _ in range(100):
+            if spawned and spawned[0].returncode is not None:
+                return spawned[0].returncode
+            await asyncio.sleep(0.01)
+
+    # when
+    returncode = asyncio.run(main())
+
+    # then
+    assert returncode == -signal.SIGKILL
@@ -0,0 +1,186 @@
+# type: ignore
+
+# framework
+import os
+import pytest
+import asyncio
+# under test
+from .core import Unshell
+from .command import Cmd
+from .environ import Environ
+from .executor import DryRunExecutor
+from .result import CommandResult
+from .cache import ResultCache, resolve_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingExecutor(DryRunExecutor):
+    async def run(self, command, opt):
+        await asyncio.sleep(0.01)
+        return await super().run(command, opt)
+
+
+def engine_with(executor, cache):
+    return Unshell({"executor": executor, "reporter": "quiet", "cache": cache})
+
+
+def test_ttl_of_should_follow_cmd_then_patterns():
+    # given
+    cache = ResultCache(ttl=30, patterns=[r"^docker ps\b"])
+
+    # then
+    assert cache.ttl_of("docker ps -q") == 30
+    assert cache.ttl_of("docker pause abc") is None
+    assert cache.ttl_of(Cmd("date", cache=True)) == 30
+    assert cache.ttl_of(Cmd("date", cache=5)) == 5.0
+    assert cache.ttl_of(Cmd("docker ps -q", cache=False)) is None
+
+
+def test_key_should_depend_on_command_env_and_cwd():
+    # given
+    cache = ResultCache()
+    environ = Environ()
+    opt = {"env": {}, "cwd": None, "umask": None, "shell": "auto"}
+
+    # then
+    assert cache.key("ls", opt, environ) == cache.key(("ls",), opt, environ)
+    assert cache.key("ls", opt, environ) != cache.key(Cmd("ls", env={"A": "1"}), opt, environ)
+    assert cache.key("ls", opt, environ) != cache.key(Cmd("ls", cwd="/"), opt, environ)
+
+
+def test_cache_should_expire_results_and_evict_least_recently_used():
+    # given
+    clock = Clock()
+    cache = ResultCache(size=2, clock=clock)
+
+    # when
+    for key in ["a", "b"]:
+        cache.put(key, 10, CommandResult(key, 0, key.encode()))
+    cache.get("a")
+    cache.put("c", 10, CommandResult("c", 0, b"c"))
+
+    # then
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    clock.now = 11
+    assert cache.get("a") is None
+
+
+def test_engine_should_reuse_cached_results():
+    # given
+    executor = DryRunExecutor({"docker ps -q": "abc\n"})
+    outputs = []
+
+    def script():
+        outputs.append((yield "docker ps -q"))
+        outputs.append((yield "docker ps -q"))
+        yield "docker pause abc"
+        yield "docker pause abc"
+
+    # when
+    with engine_with(executor, {"patterns": ["docker ps"]}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == ["abc\n", "abc\n"]
+    assert executor.commands == ["docker ps -q", "docker pause abc", "docker pause abc"]
+    assert engine.cache.stats() == {"hits": 1, "misses": 1, "collapsed": 0}
+
+
+def test_engine_should_collapse_identical_commands_in_flight():
+    # given
+    executor = CountingExecutor()
+
+    def script():
+        yield [Cmd("date", cache=True)] * 3
+
+    # when
+    with engine_with(executor, {}) as engine:
+        engine(script)
+
+    # then
+    assert executor.commands == ["date"]
+    assert engine.cache.stats() == {"hits": 0, "misses": 1, "collapsed": 2}
+
+
+def test_engine_should_keep_the_slot_of_a_collapsed_command_when_its_first_caller_is_cancelled():
+    # given
+    executor = CountingExecutor()
+    finished = []
+
+    async def first():
+        yield Cmd("date", cache=True)
+
+    async def second():
+        finished.append((yield Cmd("date", cache=True)).command)
+
+    async def other():
+        finished.append((yield "hostname").command)
+
+    async def main(engine):
+        cancelled = asyncio.ensure_future(engine.run(first))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(engine.run(second))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await engine.run(other)
+        await waiting
+
+    # when
+    with Unshell({"executor": executor, "reporter": "quiet", "concurrency": 1}) as engine:
+        engine._run_until_complete(main(engine))
+
+    # then
+    assert finished == ["date", "hostname"]
+    assert executor.commands == ["date", "hostname"]
+
+
+def test_engine_should_not_cache_failures():
+    # given
+    def script():
+        yield "false"
+
+    # when
+    with Unshell({"reporter": "quiet", "cache": {"patterns": ["false"]}}) as engine:
+        for _ in range(2):
+            with pytest.raises(Exception):
+                engine(script)
+
+    # then
+    assert engine.cache.stats()["misses"] == 2
+
+
+def test_cache_should_reuse_results_across_runs_from_disk(tmp_path):
+    # given
+    executor = DryRunExecutor({"docker ps -q": "abc\n"})
+
+    outputs = []
+
+    def script():
+        outputs.append((yield Cmd("docker ps -q", cache=True)))
+
+    # when
+    for _ in range(2):  # a fresh engine each time, only the disk is shared
+        with engine_with(executor, {"dir": str(tmp_path)}) as engine:
+            engine(script)
+
+    # then
+    assert outputs == ["abc\n", "abc\n"]
+    assert executor.commands == ["docker ps -q"]
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_resolve_cache_should_accept_a_shared_cache():
+    # given
+    cache = ResultCache()
+
+    # then
+    assert resolve_cache({"cache": cache}) is cache
+    assert resolve_cache({"cache": {"ttl": 5}}).ttl == 5
@@ -0,0 +1,171 @@
+# type: ignore
+
+# framework
+import json
+import pytest
+# under test
+from .core import Unshell
+from .command import Cmd
+from .executor import DryRunExecutor, resolve_executor
+from .cassette import RecordingExecutor, ReplayExecutor
+
+
+def pause_all():
+    ids = yield "docker ps -q"
+    yield [f"docker pause {id}" for id in ids.split()]
+    yield Cmd(["docker", "events", "--since", "1m"])
+
+
+def record(path):
+    executor = DryRunExecutor({"docker ps -q": "abc\ndef", "docker pause abc": "abc"})
+
+    with Unshell({"executor": RecordingExecutor(path, executor), "reporter": "quiet"}) as engine:
+        engine(pause_all)
+
+    return executor
+
+
+def test_recording_executor_should_write_a_cassette(tmp_path):
+    # given
+    path = str(tmp_path / "pause.cassette")
+
+    # when
+    record(path)
+
+    # then
+    header, *entries = [json.loads(line) for line in open(path)]
+    assert header == {"cassette": 1}
+    assert entries[0] == {"command": "docker ps -q", "stdout": "abc\ndef", "yield": 0}
+    assert sorted(entry["command"] for entry in entries[1:3]) == ["docker pause abc", "docker pause def"]
+    assert {entry["yield"] for entry in entries[1:3]} == {1}
+    assert entries[3] == {"command": "docker events --since 1m", "yield": 2}
+
+
+def test_recording_executor_should_write_each_result_as_it_is_done(tmp_path):
+    # given
+    path = str(tmp_path / "ps.cassette")
+    engine = Unshell({"executor": RecordingExecutor(path, DryRunExecutor()), "reporter": "quiet"})
+    written = []
+
+    def script():
+        yield "docker ps -q"
+        with open(path) as file:
+            written.append(len(file.readlines()))
+
+    # when
+    engine(script)
+    engine(script)
+
+    # then
+    assert written == [2, 3]
+    with open(path) as file:
+        assert len(file.readlines()) == 3
+
+
+def test_replay_executor_should_answer_without_spawning(tmp_path):
+    # given
+    path = str(tmp_path / "pause.cassette")
+    record(path)
+    executor = ReplayExecutor(path)
+    outputs = []
+
+    def script():
+        outputs.append((yield "docker ps -q"))
+        outputs.append((yield ["docker pause def", "docker pause abc"]))
+        yield ("docker", "events", "--since", "1m")
+
+    # when
+    with Unshell({"executor": executor, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == ["abc\ndef", ["", "abc"]]
+    assert executor.divergences == []
+    executor.verify()
+
+
+def test_replay_executor_should_keep_failures_and_binary_outputs(tmp_path):
+    # given
+    path = str(tmp_path / "fail.cassette")
+    executor = RecordingExecutor(path)
+
+    def script():
+        yield "printf '\\377\\376'; echo oops >&2; exit 3"
+
+    with Unshell({"executor": executor, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="oops"):
+            engine(script)
+
+    # when
+    replay = resolve_executor({"executor": "replay", "cassette": path})
+
+    # then
+    replayed, = [entry for entries in replay.recorded.values() for entry in entries]
+    assert replayed["returncode"] == 3
+    assert replayed["stdout_base64"] == "//4="
+    with Unshell({"executor": replay, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="oops"):
+            engine(script)
+
+
+def test_replay_executor_should_report_divergences(tmp_path):
+    # given
+    path = str(tmp_path / "pause.cassette")
+    record(path)
+    executor = ReplayExecutor(path, strict=False)
+
+    def script():
+        ids = yield "docker ps -q"
+        yield f"docker unpause {ids.split()[0]}"
+
+    # when
+    with Unshell({"executor": executor, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert executor.divergences == [
+        "+ docker unpause abc", "- docker pause abc", "- docker pause def", "- docker events --since 1m"
+    ]
+    with pytest.raises(Exception, match="diverged"):
+        executor.verify()
+
+
+def test_replay_executor_should_report_yields_out_of_order(tmp_path):
+    # given
+    path = str(tmp_path / "pause.cassette")
+    record(path)
+    executor = ReplayExecutor(path, strict=False)
+
+    def script():
+        yield "docker ps -q"
+        yield Cmd(["docker", "events", "--since", "1m"])
+        yield ["docker pause def", "docker pause abc"]
+
+    # when
+    with Unshell({"executor": executor, "reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    assert executor.divergences == ["~ docker pause def", "~ docker pause abc"]
+    with pytest.raises(Exception, match="is recorded at another step"):
+        with Unshell({"executor": ReplayExecutor(path), "reporter": "quiet"}) as engine:
+            engine(script)
+
+
+def test_replay_executor_should_raise_on_unrecorded_commands_when_strict(tmp_path):
+    # given
+    path = str(tmp_path / "pause.cassette")
+    record(path)
+
+    def script():
+        yield "docker rm -f abc"
+
+    # then
+    with Unshell({"executor": "replay", "cassette": path, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="docker rm -f abc is not recorded"):
+            engine(script)
+
+
+def test_cassette_executors_should_need_a_path():
+    with pytest.raises(ValueError, match="needs a cassette"):
+        resolve_executor({"executor": "record"})
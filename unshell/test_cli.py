@@ -1,5 +1,7 @@
 # type: ignore
 import os
+import sys
+import subprocess
 from unittest.mock import call, MagicMock
 # mock
 import builtins
@@ -23,11 +25,18 @@ def test_cli_should_display_help_on_help_command():
 Execute script through unshell runtime
 
 Usage:
-unshell COMMAND [SCRIPT_PATH] [ARGS...]
+unshell COMMAND [OPTIONS] [SCRIPT_PATH] [ARGS...]
 
 Commands:
 help      Print this help message
 run       run a script through unshell runtime
+serve     keep a warm unshell running scripts submitted with run --daemon
+agent     run the commands of remote engines, on [ADDRESS] (host:port or socket, 127.0.0.1:7700)
+
+Options:
+--cache           keep the compiled script in ~/.cache/unshell (or set UNSHELL_CACHE=1)
+--time-startup    print where the startup time goes
+--daemon          run the script on the unshell serve daemon (socket: UNSHELL_SOCKET)
 """)
 
 
@@ -125,3 +134,35 @@ def test_cli_should_execute_script_on_run_command():
         call("• echo world"),
         call("➜ world\n"),
     ]
+
+
+def test_cli_should_time_startup(tmp_path, monkeypatch):
+    # given
+    scriptPath = tmp_path / "script.py"
+    scriptPath.write_text("def script():\n    yield 'true'\n")
+    argv = ['cli.py', 'run', '--time-startup', '--cache', str(scriptPath)]
+    env = {"UNSHELL_CACHE_DIR": str(tmp_path / "cache")}
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # when
+    cli(argv, env)
+
+    # then
+    lines = [str(printed) for printed in builtins.print.mock_calls]
+    assert any("import asyncio" in line for line in lines)
+    assert any("load script (cache)" in line for line in lines)
+    assert any("total" in line for line in lines)
+    assert os.listdir(tmp_path / "cache")
+
+
+def test_cli_should_not_import_the_daemon_client_without_daemon():
+    # when
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, unshell.cli; print('unshell.client' in sys.modules)"],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    # then
+    assert imported == "False\n"
@@ -0,0 +1,58 @@
+# type: ignore
+
+# test
+from .command import Cmd, distinct, to_argv, to_shell
+
+
+def test_to_argv_should_split_shell_free_command():
+    assert to_argv("docker pause 'my container'") == ["docker", "pause", "my container"]
+
+
+def test_to_argv_should_keep_shell_for_shell_features():
+    for command in ["a | b", "a && b", "echo $HOME", "ls *", "cd /tmp", "A=1 b", "echo `id`", "echo 'open"]:
+        assert to_argv(command) is None
+
+
+def test_to_argv_should_follow_shell_option():
+    assert to_argv("echo ok", True) is None
+    assert to_argv("echo a|b", False) == ["echo", "a|b"]
+
+
+def test_to_argv_should_exec_sequences_directly():
+    assert to_argv(("echo", "$HOME"), True) == ["echo", "$HOME"]
+    assert to_argv(Cmd(["ls", "-l"])) == ["ls", "-l"]
+
+
+def test_to_argv_should_prefer_command_shell_setting():
+    assert to_argv(Cmd("echo ok", shell=True)) is None
+    assert to_argv(Cmd("echo ok", shell=False), True) == ["echo", "ok"]
+
+
+def test_to_shell_should_quote_sequences():
+    assert to_shell(("echo", "a b")) == "echo 'a b'"
+    assert to_shell(Cmd("ls | wc")) == "ls | wc"
+
+
+def test_distinct_should_keep_order_and_positions():
+    # given
+    commands = ["ls", ["echo", "a"], "ls", ("echo", "a"), Cmd("ls", env={"A": "1"}), Cmd("ls", env={"A": "1"}), "pwd"]
+
+    # when
+    unique, positions = distinct(commands)
+
+    # then
+    assert unique == ["ls", ["echo", "a"], Cmd("ls", env={"A": "1"}), "pwd"]
+    assert positions == [0, 1, 0, 1, 2, 2, 3]
+
+
+def test_distinct_should_tell_commands_apart_by_their_limits():
+    # given
+    make = Cmd("make", limits={"cpu": 60})
+    commands = [make, Cmd("make", limits={"cpu": 60}), Cmd("make", limits={"cpu": 1}), "make"]
+
+    # when
+    unique, positions = distinct(commands)
+
+    # then
+    assert unique == [make, Cmd("make", limits={"cpu": 1}), "make"]
+    assert positions == [0, 0, 1, 2]
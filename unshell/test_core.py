@@ -7,39 +7,42 @@ from typing import Callable
 import pytest
 from unittest.mock import call, MagicMock
 # mock
+import os
+import time
 import builtins
 import asyncio
 # under test
-from .core import Unshell
+from .core import Unshell, Runtime
+from .command import AsCompleted, Compute, Cmd, Stream, Gather
+from .executor import DryRunExecutor
+from .reporter import Reporter
 
 # mock
 loop = asyncio.get_event_loop()
 
 
+@pytest.fixture(autouse=True)
+def restore_mocks():
+    originals = (builtins.print, asyncio.create_subprocess_shell, asyncio.create_subprocess_exec)
+    yield
+    builtins.print, asyncio.create_subprocess_shell, asyncio.create_subprocess_exec = originals
+
+
 def make_future_process(
     return_code,
     stdout,
     stderr
 ):
-    @dataclass
-    class Stdout:
-        def decode(self, format):
-            return stdout
-
-    @dataclass
-    class Stderr:
-        def decode(self, format):
-            return stderr
-
     @dataclass
     class Process:
         returncode = return_code
+        pid = 42
 
         async def wait(self):
             return None
 
         async def communicate(self):
-            return [Stdout(), Stderr()]
+            return [(stdout or "").encode(), (stderr or "").encode()]
 
     future_process = asyncio.Future(loop=loop)
     future_process.set_result(Process())
@@ -51,7 +54,7 @@ def make_future_process(
 
 def test_unshell_should_return_function():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
 
     # when
     output = Unshell(opt)
@@ -76,7 +79,7 @@ def test_unshell_should_raise_if_script_not_generator():
 
 def test_unshell_should_process_command():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo OK"
     stdout = "result of echo OK"
     stderr = ""
@@ -96,6 +99,7 @@ def test_unshell_should_process_command():
         cmd,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
     )
     assert builtins.print.mock_calls == [
         call(f"• {cmd}"),
@@ -105,7 +109,7 @@ def test_unshell_should_process_command():
 
 def test_unshell_should_not_process_unvalid_command():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
 
     def script():
         yield ""
@@ -122,7 +126,7 @@ def test_unshell_should_not_process_unvalid_command():
 
 def test_unshell_should_handle_command_throwing_error():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo OK"
     stderr = "cmd error"
 
@@ -146,33 +150,60 @@ def test_unshell_should_handle_command_throwing_error():
         ]
 
 
-def test_unshell_should_throw_if_nothing_returns():
+def test_unshell_should_throw_if_command_fails_silently():
     # given
-    opt = {"env": {}}
-    cmd = "echo OK"
+    opt = {"env": {}, "shell": True}
+    cmd = "false"
 
     def script():
         yield f"{cmd}"
 
     # mock
     builtins.print = MagicMock()
-    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(None, None, None))
+    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(1, None, None))
 
     # when
-    try:
+    with pytest.raises(Exception) as err:
         Unshell(opt)(script)
-    except Exception as err:
-        # then
-        err_msg = "unshell: something went wrong"
-        assert str(err) == err_msg
-        assert builtins.print.mock_calls == [
-            call(f"• {cmd}"),
-        ]
+
+    # then
+    err_msg = f"{cmd}: exited with status 1"
+    assert str(err.value) == err_msg
+    assert builtins.print.mock_calls == [
+        call(f"• {cmd}"),
+        call(err_msg),
+    ]
+
+
+def test_unshell_should_return_empty_result_of_silent_command():
+    # given
+    opt = {"env": {}, "shell": True}
+    cmd = "docker pause abc"
+    results = []
+
+    def script():
+        results.append((yield f"{cmd}"))
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(0, None, None))
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert results == [""]
+    assert results[0].returncode == 0
+    assert results[0].pid == 42
+    assert results[0].wall >= 0
+    assert builtins.print.mock_calls == [
+        call(f"• {cmd}"),
+    ]
 
 
 def test_unshell_should_process_several_command():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo OK"
     stdout = "result of echo OK"
 
@@ -192,12 +223,14 @@ def test_unshell_should_process_several_command():
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
     ]
     assert builtins.print.mock_calls == [
@@ -210,7 +243,7 @@ def test_unshell_should_process_several_command():
 
 def test_unshell_should_process_yield_and_return_command():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo OK"
     stdout = "result of echo OK"
 
@@ -230,12 +263,14 @@ def test_unshell_should_process_yield_and_return_command():
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
     ]
     assert builtins.print.mock_calls == [
@@ -248,7 +283,7 @@ def test_unshell_should_process_yield_and_return_command():
 
 def test_unshell_should_pass_cmd_res_to_next_cmd():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd1 = "echo 1"
     cmd2 = "echo 2"
     stdout = "result of echo"
@@ -269,19 +304,21 @@ def test_unshell_should_pass_cmd_res_to_next_cmd():
         call(
             cmd1,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             f"{cmd2} {stdout}",
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
     ]
 
 
 def test_unshell_should_pass_args_to_script():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo"
     script_args = ['1', '2']
     stdout = "result of echo"
@@ -302,12 +339,14 @@ def test_unshell_should_pass_args_to_script():
         call(
             f"{cmd} {script_args[0]}",
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             f"{cmd} {script_args[1]}",
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
     ]
     assert builtins.print.mock_calls == [
@@ -320,7 +359,7 @@ def test_unshell_should_pass_args_to_script():
 
 def test_unshell_should_process_async_command():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd = "echo OK"
     stdout = "result of echo OK"
     stderr = ""
@@ -344,12 +383,14 @@ def test_unshell_should_process_async_command():
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         )
     ]
     assert builtins.print.mock_calls == [
@@ -362,7 +403,7 @@ def test_unshell_should_process_async_command():
 
 def test_unshell_should_pass_cmd_res_to_next_async_cmd():
     # given
-    opt = {"env": {}}
+    opt = {"env": {}, "shell": True}
     cmd1 = "echo 1"
     cmd2 = "echo 2"
     stdout = "result of echo OK"
@@ -390,12 +431,14 @@ def test_unshell_should_pass_cmd_res_to_next_async_cmd():
         call(
             cmd1,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         ),
         call(
             f"{cmd2} {stdout}",
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
         )
     ]
     assert builtins.print.mock_calls == [
@@ -404,3 +447,629 @@ def test_unshell_should_pass_cmd_res_to_next_async_cmd():
         call(f"• {cmd2} {stdout}"),
         call(f"➜ {stdout}")
     ]
+
+
+def make_stream_process(return_code, stdout, stderr):
+    @dataclass
+    class Process:
+        returncode = None
+
+        def __post_init__(self):
+            self.stdout = asyncio.StreamReader()
+            self.stdout.feed_data(stdout)
+            self.stdout.feed_eof()
+            self.stderr = asyncio.StreamReader()
+            self.stderr.feed_data(stderr)
+            self.stderr.feed_eof()
+
+        async def wait(self):
+            self.returncode = return_code
+            return return_code
+
+        def kill(self):
+            self.returncode = -9
+
+    async def spawn(*args, **kwargs):
+        return Process()
+
+    return spawn
+
+
+def test_unshell_should_stream_command_lines():
+    # given
+    opt = {"env": {}, "shell": True}
+    cmd = "docker logs app"
+    lines = []
+
+    async def script():
+        output = yield Stream(cmd)
+        async for line in output:
+            lines.append(line)
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=make_stream_process(0, b"a\nb\xc3\xa9\nc", b""))
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert lines == ["a\n", "bé\n", "c"]
+    assert asyncio.create_subprocess_shell.call_args.kwargs["limit"] == Stream(cmd).limit
+    assert builtins.print.mock_calls == [
+        call(f"• {cmd}"),
+    ]
+
+
+def test_unshell_should_stream_command_chunks_split_inside_a_character():
+    # given
+    opt = {"env": {}, "shell": True}
+    chunks = []
+
+    async def script():
+        output = yield Stream("cat file", chunk_size=2)
+        async for chunk in output:
+            chunks.append(chunk)
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=make_stream_process(0, "aéb".encode(), b""))
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert "".join(chunks) == "aéb"
+
+
+def test_unshell_should_raise_on_streamed_command_error():
+    # given
+    opt = {"env": {}, "shell": True}
+    cmd = "cat missing"
+
+    async def script():
+        output = yield Stream(cmd)
+        async for _ in output:
+            pass
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=make_stream_process(1, b"", b"no such file"))
+
+    # then
+    with pytest.raises(Exception, match=f"{cmd}: no such file"):
+        Unshell(opt)(script)
+
+
+def test_unshell_should_refuse_stream_from_sync_script():
+    # given
+    def script():
+        yield Stream("docker logs app")
+
+    # then
+    with pytest.raises(TypeError):
+        Unshell()(script)
+
+
+def test_unshell_should_bound_list_commands_in_flight():
+    # given
+    opt = {"env": {}, "shell": True, "concurrency": 2}
+    in_flight, peak = [0], [0]
+    results = []
+
+    async def spawn(cmd, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return await make_future_process(0, cmd, "")
+
+    def script():
+        res = yield [f"echo {i}" for i in range(5)]
+        results.extend(res)
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=spawn)
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert peak[0] == 2
+    assert results == [f"echo {i}" for i in range(5)]
+
+
+def test_unshell_should_apply_gather_concurrency():
+    # given
+    opt = {"env": {}, "shell": True}
+    in_flight, peak = [0], [0]
+
+    async def spawn(cmd, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return await make_future_process(0, cmd, "")
+
+    def script():
+        yield Gather([f"echo {i}" for i in range(4)], concurrency=1)
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=spawn)
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert peak[0] == 1
+
+
+def test_unshell_should_exec_shell_free_command_without_shell():
+    # given
+    opt = {"env": {}}
+    stdout = "hello world"
+
+    def script():
+        yield "echo 'hello world'"
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock()
+    asyncio.create_subprocess_exec = MagicMock(return_value=make_future_process(0, stdout, ""))
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    asyncio.create_subprocess_shell.assert_not_called()
+    asyncio.create_subprocess_exec.assert_called_once_with(
+        "echo", "hello world",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    assert builtins.print.mock_calls == [
+        call("• echo 'hello world'"),
+        call(f"➜ {stdout}"),
+    ]
+
+
+def test_unshell_should_keep_shell_for_shell_syntax():
+    # given
+    opt = {"env": {}}
+    stdout = "result"
+    cmds = ["echo $HOME", "ls | wc -l", "echo ok > file", "cd /tmp", "FOO=1 env", "ls *.py"]
+
+    def script():
+        for cmd in cmds:
+            yield cmd
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(0, stdout, ""))
+    asyncio.create_subprocess_exec = MagicMock()
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    asyncio.create_subprocess_exec.assert_not_called()
+    assert [c.args[0] for c in asyncio.create_subprocess_shell.mock_calls] == cmds
+
+
+def test_unshell_should_exec_argv_commands():
+    # given
+    opt = {"env": {}, "shell": True}
+    stdout = "result"
+
+    def script():
+        yield ("docker", "pause", "a b")
+        yield Cmd(["ls", "-l"])
+        yield Cmd("ls *.py", shell=True)
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(0, stdout, ""))
+    asyncio.create_subprocess_exec = MagicMock(return_value=make_future_process(0, stdout, ""))
+
+    # when
+    Unshell(opt)(script)
+
+    # then
+    assert [c.args for c in asyncio.create_subprocess_exec.mock_calls] == [
+        ("docker", "pause", "a b"),
+        ("ls", "-l"),
+    ]
+    assert [c.args for c in asyncio.create_subprocess_shell.mock_calls] == [("ls *.py",)]
+    assert builtins.print.mock_calls[0] == call("• docker pause 'a b'")
+
+
+def test_unshell_should_report_missing_program_on_direct_exec():
+    # given
+    opt = {"env": {}}
+    cmd = "unshell-missing-program --flag"
+
+    def script():
+        yield cmd
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_exec = MagicMock(
+        side_effect=FileNotFoundError(2, "No such file or directory", "unshell-missing-program")
+    )
+
+    # then
+    with pytest.raises(Exception, match=f"{cmd}: No such file or directory: unshell-missing-program"):
+        Unshell(opt)(script)
+
+
+def test_runtime_should_run_scripts_from_a_running_loop():
+    # given
+    opt = {"env": {}, "shell": True}
+    stdout = "result"
+    results = []
+
+    def script(name):
+        res = yield f"echo {name}"
+        results.append((name, res))
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(return_value=make_future_process(0, stdout, ""))
+
+    async def main():
+        async with Runtime(opt) as engine:
+            await asyncio.gather(engine.run(script, "a"), engine.run(script, "b"))
+
+    # when
+    asyncio.run(main())
+
+    # then
+    assert sorted(results) == [("a", stdout), ("b", stdout)]
+
+
+def test_runtime_should_reuse_its_loop_until_closed():
+    # given
+    loops = []
+
+    def script():
+        loops.append(asyncio.get_event_loop())
+        yield ""
+
+    # when
+    with Runtime() as engine:
+        engine(script)
+        engine(script)
+
+    # then
+    assert loops[0] is loops[1]
+    assert loops[0].is_closed()
+
+
+def test_runtime_should_close_the_loop_of_a_one_shot_call():
+    # given
+    loops = []
+    closed = []
+
+    class Executor(DryRunExecutor):
+        async def close(self):
+            closed.append(True)
+
+    def script():
+        loops.append(asyncio.get_event_loop())
+        yield "echo hi"
+
+    engine = Runtime({"executor": Executor(), "reporter": "quiet"})
+
+    # when
+    engine(script)
+    engine(script)
+
+    # then
+    assert loops[0] is not loops[1]
+    assert all(loop.is_closed() for loop in loops)
+    assert closed == [True, True]
+
+
+def test_runtime_should_run_a_batch_of_scripts_with_a_shared_budget():
+    # given
+    opt = {"env": {}, "shell": True, "concurrency": 2}
+    in_flight, peak = [0], [0]
+
+    async def spawn(cmd, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if "fail" in cmd:
+            return await make_future_process(1, "", "boom")
+        return await make_future_process(0, cmd, "")
+
+    def script(id):
+        yield f"docker pause {id}"
+        yield f"docker unpause {id}"
+
+    # mock
+    builtins.print = MagicMock()
+    asyncio.create_subprocess_shell = MagicMock(side_effect=spawn)
+
+    # when
+    with Runtime(opt) as engine:
+        results = engine.run_many_sync([(script, [id]) for id in ["a", "fail", "b", "c"]])
+
+    # then
+    assert peak[0] == 2
+    assert [result.args for result in results] == [("a",), ("fail",), ("b",), ("c",)]
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert results[0].value == "docker unpause a"
+    assert str(results[1].error) == "docker pause fail: boom"
+
+
+def test_unshell_should_run_commands_on_warm_shell_pool():
+    # given
+    opt = {"env": {}, "executor": "pool", "pool": {"size": 1}}
+    results = []
+
+    def script():
+        first = yield "echo $$"
+        second = yield ("echo", "$$")
+        results.extend([first, second])
+
+    # mock
+    builtins.print = MagicMock()
+
+    # when
+    with Unshell(opt) as engine:
+        engine(script)
+        engine(script)
+
+    # then
+    assert results[0] == results[2]
+    assert results[1] == "$$\n"
+
+
+def test_unshell_should_apply_env_cwd_and_umask():
+    # given
+    opt = {"env": {"FOO": "bar"}, "cwd": "/tmp", "umask": 0o077}
+    results = []
+
+    def script():
+        results.append((yield "sh -c 'echo $FOO; pwd; umask'"))
+        results.append((yield Cmd(["sh", "-c", "echo $FOO $BAZ; pwd"], env={"BAZ": "qux"}, cwd="/")))
+
+    # mock
+    builtins.print = MagicMock()
+
+    # when
+    with Unshell(opt) as engine:
+        engine(script)
+
+    # then
+    assert results == ["bar\n/tmp\n0077\n", "bar qux\n/\n"]
+
+
+def test_unshell_should_apply_env_cwd_and_umask_on_shell_pool():
+    # given
+    opt = {"env": {"FOO": "bar"}, "cwd": "/tmp", "executor": "pool"}
+    results = []
+
+    def script():
+        results.append((yield "echo $FOO; pwd"))
+        results.append((yield Cmd("echo $FOO $BAZ; pwd; umask", env={"BAZ": "qux"}, cwd="/", umask=0o077)))
+        results.append((yield "echo $BAZ; pwd"))
+
+    # mock
+    builtins.print = MagicMock()
+
+    # when
+    with Unshell(opt) as engine:
+        engine(script)
+
+    # then
+    assert results == ["bar\n/tmp\n", "bar qux\n/\n0077\n", "\n/tmp\n"]
+
+
+def test_unshell_should_kill_process_group_on_command_timeout(tmp_path):
+    # given
+    pid_file = tmp_path / "pid"
+    opt = {"kill_grace": 0.1}
+
+    def script():
+        yield Cmd(f"sleep 30 & echo $! > {pid_file}; wait", timeout=0.2)
+
+    # mock
+    builtins.print = MagicMock()
+
+    # when
+    with pytest.raises(Exception, match="timed out after 0.2s"):
+        with Unshell(opt) as engine:
+            engine(script)
+
+    # then
+    time.sleep(0.1)
+    status = f"/proc/{int(pid_file.read_text())}/status"
+    assert not os.path.exists(status) or "zombie" in open(status).read()
+
+
+def test_unshell_should_cancel_siblings_on_first_failure():
+    # given
+    opt = {"timeout": 10, "kill_grace": 0.1}
+
+    def script():
+        yield ["sleep 10", "sh -c 'echo boom >&2; exit 1'"]
+
+    # mock
+    builtins.print = MagicMock()
+    start = time.monotonic()
+
+    # when
+    with pytest.raises(Exception, match="boom"):
+        with Unshell(opt) as engine:
+            engine(script)
+
+    # then
+    assert time.monotonic() - start < 5
+
+
+def test_unshell_should_time_out_scripts():
+    # given
+    opt = {"script_timeout": 0.2, "kill_grace": 0.1}
+
+    def script():
+        yield "echo started"
+        yield "sleep 10"
+
+    # mock
+    builtins.print = MagicMock()
+
+    # then
+    with pytest.raises(Exception, match="unshell: script timed out after 0.2s"):
+        with Unshell(opt) as engine:
+            engine(script)
+
+
+def test_unshell_should_dedupe_list_commands_when_asked():
+    # given
+    executor = DryRunExecutor({"echo a": "a\n", "echo b": "b\n"})
+    outputs = []
+
+    def script():
+        outputs.append((yield ["echo a", "echo b", "echo a", "echo a"]))
+        outputs.append((yield Gather(["echo a", "echo a"], dedupe=False)))
+
+    # when
+    with Unshell({"executor": executor, "reporter": "quiet", "dedupe": True}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == [["a\n", "b\n", "a\n", "a\n"], ["a\n", "a\n"]]
+    assert executor.commands == ["echo a", "echo b", "echo a", "echo a"]
+    assert engine.stats()["deduped"] == 2
+
+
+def test_unshell_should_summarize_the_commands_saved_by_each_script():
+    # given
+    summaries = []
+
+    class Summaries(Reporter):
+        def summary(self, stats):
+            summaries.append(stats)
+
+    def script():
+        yield ["echo a", "echo a"]
+
+    def other():
+        yield "echo b"
+
+    # when
+    with Unshell({"executor": DryRunExecutor(), "reporter": Summaries(), "dedupe": True}) as engine:
+        engine(script)
+        engine(other)
+
+    # then
+    assert summaries == [
+        {"deduped": 1, "hits": 0, "misses": 0, "collapsed": 0},
+        {"deduped": 0, "hits": 0, "misses": 0, "collapsed": 0},
+    ]
+    assert engine.stats()["deduped"] == 1
+
+
+def test_unshell_should_send_results_as_completed_to_async_script():
+    # given
+    seen = []
+
+    async def script():
+        results = yield AsCompleted(["sleep 0.2; echo slow", "echo fast"])
+        async for index, result in results:
+            seen.append((index, str(result)))
+
+    def sync_script():
+        yield AsCompleted(["echo fast"])
+
+    # when
+    with Unshell({"reporter": "quiet"}) as engine:
+        engine(script)
+
+        # then
+        assert seen == [(1, "fast\n"), (0, "slow\n")]
+        with pytest.raises(TypeError):
+            engine(sync_script)
+
+
+def test_unshell_should_kill_commands_left_as_completed_when_the_script_ends(tmp_path):
+    # given
+    pid_file = tmp_path / "pid"
+
+    async def script():
+        results = yield AsCompleted([f"echo $$ > {pid_file}; exec sleep 30", "sleep 0.2; echo fast"])
+        async for index, result in results:
+            break
+
+    # when
+    with Unshell({"reporter": "quiet"}) as engine:
+        start = time.perf_counter()
+        engine(script)
+        elapsed = time.perf_counter() - start
+
+        # then
+        assert elapsed < 5
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+
+
+def test_unshell_should_kill_streams_never_read_when_the_script_ends(tmp_path):
+    # given
+    pid_file = tmp_path / "pid"
+
+    async def script():
+        yield Stream(f"echo $$ > {pid_file}; exec sleep 30")
+        yield "sleep 0.2"
+
+    # when
+    with Unshell({"reporter": "quiet"}) as engine:
+        engine(script)
+
+        # then
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+
+
+def test_unshell_should_step_sync_scripts_on_threads_when_asked():
+    # given
+    finished = []
+
+    def blocking():
+        yield "true"
+        time.sleep(0.3)  # e.g. heavy parsing between two yields
+        finished.append("blocking")
+        return "true"
+
+    def quick():
+        for _ in range(3):
+            yield "true"
+        finished.append("quick")
+
+    # when
+    with Unshell({"reporter": "quiet", "steps": "thread"}) as engine:
+        results = engine.run_many_sync([(blocking, ()), (quick, ())])
+
+    # then
+    assert [result.ok for result in results] == [True, True]
+    assert finished == ["quick", "blocking"]
+
+
+def test_unshell_should_compute_in_process_pool():
+    # given
+    outputs = []
+
+    def script():
+        outputs.append((yield Compute(pow, (2, 10))))
+
+    # when
+    with Unshell({"reporter": "quiet", "processes": 1}) as engine:
+        engine(script)
+
+    # then
+    assert outputs == [1024]
@@ -0,0 +1,182 @@
+# type: ignore
+
+# framework
+import io
+import os
+import socket
+import stat
+import pytest
+import asyncio
+# under test
+from .client import socket_path, submit
+from .daemon import Daemon, remove_stale_socket
+
+
+def write_script(path, body):
+    path.write_text(body)
+    return str(path)
+
+
+async def submit_to(daemon, script, args=(), env=None):
+    out = io.StringIO()
+    error = await asyncio.get_running_loop().run_in_executor(
+        None, submit, daemon.path, script, list(args), env or {"GREETING": "hello"}, out
+    )
+    return out.getvalue(), error
+
+
+def test_daemon_should_run_scripts_and_stream_output(tmp_path):
+    # given
+    script = write_script(tmp_path / "script.py", "def script(name):\n    yield f'echo $GREETING {name}'\n")
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+
+    async def main():
+        await daemon.start()
+        try:
+            return await asyncio.gather(*[submit_to(daemon, script, [name]) for name in ["ann", "bob"]])
+        finally:
+            await daemon.close()
+
+    # when
+    results = asyncio.run(main())
+
+    # then
+    assert results == [("• echo $GREETING ann\n➜ hello ann\n\n", None), ("• echo $GREETING bob\n➜ hello bob\n\n", None)]
+    assert not os.path.exists(daemon.path)
+
+
+def test_daemon_should_run_scripts_with_the_client_environment_as_is(tmp_path, monkeypatch):
+    # given
+    monkeypatch.setenv("UNSHELL_DAEMON_ONLY", "leak")
+    body = "def script():\n    yield 'echo ${#BIG} ${UNSHELL_DAEMON_ONLY:-unset}'\n"
+    script = write_script(tmp_path / "script.py", body)
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+    env = {"PATH": os.environ["PATH"], "BIG": "x" * 100000}  # over the default 64 KiB line limit
+
+    async def main():
+        await daemon.start()
+        try:
+            return await submit_to(daemon, script, env=env)
+        finally:
+            await daemon.close()
+
+    # when
+    out, error = asyncio.run(main())
+
+    # then
+    assert error is None
+    assert "➜ 100000 unset" in out
+
+
+def test_daemon_should_send_back_script_errors(tmp_path):
+    # given
+    failing = write_script(tmp_path / "failing.py", "def script():\n    yield 'false'\n")
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+
+    async def main():
+        await daemon.start()
+        try:
+            return await submit_to(daemon, failing), await submit_to(daemon, str(tmp_path / "missing.py"))
+        finally:
+            await daemon.close()
+
+    # when
+    (_, error), (_, missing) = asyncio.run(main())
+
+    # then
+    assert error == "false: exited with status 1"
+    assert missing == "unshell: Invalid script or script path"
+
+
+def test_daemon_should_compile_scripts_once_until_they_change(tmp_path):
+    # given
+    script = tmp_path / "script.py"
+    write_script(script, "def script():\n    yield 'echo 1'\n")
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+
+    # when
+    first = daemon.load(str(script))
+    code = daemon.scripts[str(script)][1]
+    second = daemon.load(str(script))
+    write_script(script, "def script():\n    yield 'echo 22'\n")
+    third = daemon.load(str(script))
+
+    # then
+    assert first is not second
+    assert daemon.scripts[str(script)][1] is not code
+    assert next(third()) == "echo 22"
+
+
+def test_daemon_socket_should_only_be_usable_by_its_owner(tmp_path):
+    # given
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+
+    async def main():
+        await daemon.start()
+        mode = stat.S_IMODE(os.stat(daemon.path).st_mode)
+        await daemon.close()
+        return mode
+
+    # then
+    assert asyncio.run(main()) == 0o600
+
+
+def test_remove_stale_socket_should_refuse_a_live_daemon(tmp_path):
+    # given
+    path = str(tmp_path / "unshell.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+
+    # when
+    with pytest.raises(Exception, match="already listening"):
+        server.listen()
+        remove_stale_socket(path)
+    server.close()
+    remove_stale_socket(path)
+
+    # then
+    assert not os.path.exists(path)
+
+
+def test_submit_should_fail_without_daemon(tmp_path):
+    # then
+    with pytest.raises(Exception, match="no daemon listening"):
+        submit(str(tmp_path / "none.sock"), "script.py", [], {}, io.StringIO())
+    assert socket_path({"UNSHELL_SOCKET": "/run/u.sock"}) == "/run/u.sock"
+    assert socket_path({"XDG_RUNTIME_DIR": "/run/user/1"}) == f"/run/user/1/unshell-{os.getuid()}.sock"
+    assert socket_path({}) == f"/tmp/unshell-{os.getuid()}/unshell.sock"
+
+
+def test_daemon_should_create_the_socket_directory_for_its_user_only(tmp_path):
+    # given
+    daemon = Daemon(str(tmp_path / "run" / "unshell.sock"))
+
+    async def main():
+        await daemon.start()
+        await daemon.close()
+
+    # when
+    asyncio.run(main())
+
+    # then
+    assert stat.S_IMODE(os.stat(tmp_path / "run").st_mode) == 0o700
+
+
+def test_submit_should_refuse_a_daemon_of_another_user(tmp_path, monkeypatch):
+    # given
+    script = write_script(tmp_path / "script.py", "def script():\n    yield 'echo hi'\n")
+    daemon = Daemon(str(tmp_path / "unshell.sock"))
+    uid = os.getuid() + 1
+
+    async def main():
+        await daemon.start()
+        monkeypatch.setattr(os, "getuid", lambda: uid)
+        try:
+            return await submit_to(daemon, script)
+        finally:
+            monkeypatch.undo()
+            await daemon.close()
+
+    # then
+    with pytest.raises(Exception, match="belongs to another user"):
+        asyncio.run(main())
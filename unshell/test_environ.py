@@ -0,0 +1,120 @@
+# type: ignore
+
+# framework
+import os
+import pytest
+# under test
+from .command import Cmd
+from . import environ as environ_module
+from .environ import Environ, command_line, process_kwargs, shell_prelude
+
+opt = {"env": {"FOO": "bar"}, "cwd": None, "umask": None}
+
+
+def test_environ_should_build_engine_environment_once():
+    # given
+    environ = Environ()
+
+    # when
+    first = environ.base(opt)
+    second = environ.base(opt)
+
+    # then
+    assert first is second
+    assert first["FOO"] == "bar"
+    assert first["PATH"] == os.environ["PATH"]
+
+
+def test_environ_should_inherit_without_engine_env():
+    # given
+    environ = Environ()
+
+    # then
+    assert environ.base({"env": {}}) is None
+    assert environ.base({"env": os.environ}) is None
+
+
+def test_environ_should_add_command_env():
+    # given
+    environ = Environ()
+
+    # when
+    env = environ.of(Cmd("env", env={"BAZ": "1"}), opt)
+
+    # then
+    assert env["FOO"] == "bar"
+    assert env["BAZ"] == "1"
+    assert "BAZ" not in environ.base(opt)
+
+
+def test_process_kwargs_should_prefer_command_settings():
+    # given
+    engine_opt = {"env": {}, "cwd": "/tmp", "umask": 0o022}
+
+    # when
+    kwargs = process_kwargs(Cmd("ls", cwd="/", umask=0o077), engine_opt, Environ())
+
+    # then
+    assert "env" not in kwargs
+    assert kwargs["cwd"] == "/"
+    assert kwargs["umask"] == 0o077
+    assert "preexec_fn" not in kwargs  # it would turn off the vfork/posix_spawn path
+
+
+def test_command_line_should_spawn_plain_commands_as_is():
+    # then
+    assert command_line("ls -l", {**opt, "shell": "auto"}) == ["ls", "-l"]
+    assert command_line("ls | wc", {**opt, "shell": "auto"}) == "ls | wc"
+
+
+def test_command_line_should_set_umask_in_a_shell_before_python_3_9(monkeypatch):
+    # given
+    monkeypatch.setattr(environ_module, "UMASK_KWARG", False)
+    engine_opt = {"env": {}, "cwd": None, "umask": 0o022, "shell": "auto"}
+
+    # then
+    assert "umask" not in process_kwargs(Cmd("ls"), engine_opt, Environ())
+    assert command_line(Cmd("ls"), engine_opt) == ["/bin/sh", "-c", 'umask 022\nexec "$@"', "sh", "ls"]
+
+
+def test_shell_prelude_should_apply_command_settings():
+    # when
+    prelude = shell_prelude(Cmd("ls", env={"A": "a b"}, cwd="/tmp", umask=0o027), opt)
+
+    # then
+    assert prelude == "export A='a b'\ncd /tmp || exit\numask 027\n"
+
+
+def test_command_line_should_merge_command_limits_over_engine_ones():
+    # given
+    engine_opt = {"env": {}, "cwd": None, "umask": None, "shell": "auto", "limits": {"nofile": 64, "cpu": 10}}
+
+    # when
+    argv = command_line(Cmd(["ls", "-l"], limits={"cpu": 1, "as": 2 ** 30}), engine_opt)
+    script = command_line(Cmd("ls | wc -l", limits={"cpu": 1}), engine_opt)
+
+    # then
+    assert argv == [
+        "/bin/sh", "-c", 'ulimit -n 64 || exit 126\nulimit -t 1 || exit 126\nulimit -v 1048576 || exit 126\nexec "$@"',
+        "sh", "ls", "-l"
+    ]
+    assert script == "ulimit -n 64 || exit 126\nulimit -t 1 || exit 126\nls | wc -l"
+
+
+def test_command_line_should_round_limits_up_and_refuse_non_positive_ones():
+    # given
+    opt = {"env": {}, "cwd": None, "umask": None, "shell": "auto"}
+
+    # when
+    argv = command_line(Cmd(["ls"], limits={"as": 100}), opt)
+
+    # then
+    assert argv[2] == 'ulimit -v 1 || exit 126\nexec "$@"'
+    with pytest.raises(ValueError, match="must be positive"):
+        command_line(Cmd("ls", limits={"as": 0}), opt)
+
+
+def test_command_line_should_refuse_unknown_limits():
+    # when
+    with pytest.raises(ValueError, match="unknown limit stack"):
+        command_line(Cmd("ls", limits={"stack": 1}), {**opt, "shell": "auto"})
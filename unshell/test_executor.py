@@ -0,0 +1,84 @@
+# type: ignore
+
+# framework
+import pytest
+from unittest.mock import MagicMock
+# mock
+import builtins
+# under test
+from .core import Unshell
+from .command import Stream
+from .executor import Capabilities, DryRunExecutor, SubprocessExecutor, resolve_executor
+
+
+def test_resolve_executor_should_build_named_executor():
+    assert isinstance(resolve_executor({"executor": "subprocess"}), SubprocessExecutor)
+    assert isinstance(resolve_executor({"executor": "dry-run"}), DryRunExecutor)
+
+
+def test_resolve_executor_should_accept_an_instance():
+    # given
+    executor = DryRunExecutor()
+
+    # then
+    assert resolve_executor({"executor": executor}) is executor
+
+
+def test_resolve_executor_should_refuse_unknown_executor():
+    with pytest.raises(ValueError):
+        resolve_executor({"executor": "unknown"})
+
+
+def test_dry_run_executor_should_record_commands(monkeypatch):
+    # given
+    executor = DryRunExecutor({"docker ps -q": "abc\ndef", "docker pause abc": "abc", "docker pause def": "def"})
+    results = []
+
+    def script():
+        ids = yield "docker ps -q"
+        results.append(ids)
+        yield [f"docker pause {id}" for id in ids.split("\n")]
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # when
+    with Unshell({"executor": executor}) as engine:
+        engine(script)
+
+    # then
+    assert results == ["abc\ndef"]
+    assert executor.commands == ["docker ps -q", "docker pause abc", "docker pause def"]
+
+
+def test_engine_should_refuse_stream_on_non_streaming_executor(monkeypatch):
+    # given
+    async def script():
+        yield Stream("docker logs app")
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # then
+    with pytest.raises(TypeError):
+        with Unshell({"executor": "dry-run"}) as engine:
+            engine(script)
+
+
+def test_engine_should_refuse_shell_command_on_executor_without_shell(monkeypatch):
+    # given
+    executor = DryRunExecutor({"ls": "file"})
+    executor.capabilities = Capabilities(argv=True, shell=False)
+
+    def script():
+        yield "ls"
+        yield "ls | wc -l"
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # then
+    with pytest.raises(TypeError):
+        with Unshell({"executor": executor}) as engine:
+            engine(script)
+    assert executor.commands == ["ls"]
@@ -0,0 +1,122 @@
+# type: ignore
+
+# framework
+import io
+import time
+import pytest
+import asyncio
+# under test
+from .core import Unshell
+from .command import Graph, Task
+from .executor import DryRunExecutor
+from .graph import critical_path, toposort
+from .reporter import PrefixReporter
+
+
+class SlowExecutor(DryRunExecutor):
+    """Commands take the seconds of their `sleep N` argument, without spawning anything"""
+
+    def __init__(self, outputs=None):
+        super().__init__(outputs)
+        self.started = []
+
+    async def run(self, command, opt):
+        self.started.append(command)
+        if command.startswith("sleep "):
+            await asyncio.sleep(float(command.split()[1]))
+        return await super().run(command, opt)
+
+
+def test_toposort_should_put_needed_tasks_first():
+    # given
+    tasks = {"push": Task("push", ["test", "build"]), "test": Task("test", ["build"]), "build": Task("build")}
+
+    # then
+    assert toposort(tasks) == ["build", "test", "push"]
+
+
+def test_toposort_should_reject_cycles_and_unknown_tasks():
+    # then
+    with pytest.raises(ValueError, match="a, b depend on each other"):
+        toposort({"a": Task("a", ["b"]), "b": Task("b", ["a"]), "c": Task("c")})
+    with pytest.raises(ValueError, match="needs unknown task"):
+        toposort({"a": Task("a", ["z"])})
+
+
+def test_critical_path_should_follow_the_needs_finishing_last():
+    # given
+    tasks = {"a": Task("a"), "b": Task("b"), "c": Task("c", ["a", "b"])}
+    timings = {"a": (0.0, 1.0), "b": (0.0, 3.0), "c": (3.0, 4.0)}
+
+    # then
+    assert critical_path(tasks, timings) == ["b", "c"]
+
+
+def test_graph_should_run_ready_tasks_as_soon_as_their_needs_are_done():
+    # given
+    executor = SlowExecutor({"echo v1": "v1\n"})
+    reporter = PrefixReporter(io.StringIO())
+    results = []
+
+    def script():
+        results.append((yield Graph({
+            "version": "echo v1",
+            "slow": "sleep 0.2",
+            "build": Task("sleep 0.05", ["version"]),
+            "push": Task(lambda needs: f"echo push {needs['version'].strip()}", ["build", "version"]),
+            "done": Task("echo done", ["push", "slow"]),
+        })))
+
+    # when
+    with Unshell({"executor": executor, "reporter": reporter}) as engine:
+        start = time.perf_counter()
+        engine(script)
+        elapsed = time.perf_counter() - start
+
+    # then
+    [result] = results
+    assert set(result) == {"version", "slow", "build", "push", "done"}
+    assert "echo push v1" in executor.started
+    assert executor.started.index("echo push v1") < executor.started.index("echo done")
+    assert elapsed < 0.35
+    assert result.critical_path == ["slow", "done"]
+    assert result.critical_time <= result.wall
+    assert "⏱ critical path" in reporter.stream.getvalue()
+
+
+def test_graph_should_give_an_empty_result_for_no_tasks():
+    # given
+    results = []
+
+    def script():
+        results.append((yield Graph({})))
+
+    # when
+    with Unshell({"reporter": "quiet"}) as engine:
+        engine(script)
+
+    # then
+    [result] = results
+    assert result == {}
+    assert result.critical_path == []
+    assert result.durations == {}
+
+
+def test_graph_should_raise_the_first_failure():
+    # given
+    ran = []
+
+    def script():
+        yield Graph({
+            "broken": "false",
+            "after": Task(lambda needs: ran.append("after") or "true", ["broken"]),
+            "other": Task(lambda needs: ran.append("other") or "true"),
+        })
+
+    # when
+    with Unshell({"reporter": "quiet", "fail_fast": False}) as engine:
+        with pytest.raises(Exception, match="false: exited with status 1"):
+            engine(script)
+
+    # then
+    assert ran == ["other"]
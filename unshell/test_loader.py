@@ -0,0 +1,88 @@
+# type: ignore
+
+# framework
+import os
+import sys
+import subprocess
+# under test
+from .loader import cache_dir, cached_code, load_script_module
+
+
+def write_script(path, value):
+    with open(path, "w") as file:
+        file.write(f"def script():\n    yield 'echo {value}'\n")
+
+
+def test_load_script_module_should_execute_script():
+    # given
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures", "scripts", "notCompatibleCmd.py")
+
+    # when
+    module = load_script_module(path)
+
+    # then
+    assert callable(module.script)
+
+
+def test_load_script_module_should_reuse_cached_code(tmp_path):
+    # given
+    script = tmp_path / "script.py"
+    cache = tmp_path / "cache"
+    write_script(script, "hello")
+
+    # when
+    first = load_script_module(str(script), str(cache))
+    entries = os.listdir(cache)
+    second = load_script_module(str(script), str(cache))
+
+    # then
+    assert next(first.script()) == next(second.script()) == "echo hello"
+    assert len(entries) == 1
+    assert os.listdir(cache) == entries
+
+
+def test_cached_code_should_compile_changed_script_again(tmp_path):
+    # given
+    script = tmp_path / "script.py"
+    write_script(script, "hello")
+    cached_code(str(script), str(tmp_path))
+
+    # when
+    write_script(script, "world!")
+    namespace = {}
+    exec(cached_code(str(script), str(tmp_path)), namespace)
+
+    # then
+    assert next(namespace["script"]()) == "echo world!"
+
+
+def test_cached_code_should_compile_when_cache_is_unwritable(tmp_path):
+    # given
+    script = tmp_path / "script.py"
+    write_script(script, "hello")
+    cache = tmp_path / "file"
+    cache.write_text("not a directory")
+
+    # when
+    code = cached_code(str(script), str(cache))
+
+    # then
+    assert code.co_filename == str(script)
+
+
+def test_cache_dir_should_follow_environment():
+    # then
+    assert cache_dir({"UNSHELL_CACHE_DIR": "/cache"}) == "/cache"
+    assert cache_dir({"XDG_CACHE_HOME": "/xdg"}) == "/xdg/unshell"
+
+
+def test_cli_should_not_import_engine_until_a_script_runs():
+    # given
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    code = "import sys, unshell.cli; print('asyncio' in sys.modules)"
+
+    # when
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+
+    # then
+    assert output.stdout == "False\n"
@@ -0,0 +1,88 @@
+# type: ignore
+
+# framework
+import pytest
+import asyncio
+from unittest.mock import MagicMock
+# mock
+import builtins
+# under test
+from .core import Unshell
+from .command import Pipeline
+from .environ import Environ
+from .pipeline import run_pipeline
+
+opt = {"env": {}, "cwd": None, "umask": None, "shell": "auto", "kill_grace": 0.1}
+
+
+def upper(lines):
+    for line in lines:
+        yield line.upper()
+
+
+def numbers(lines):
+    for number in range(100000):
+        yield str(number)
+
+
+def failing(lines):
+    for line in lines:
+        raise ValueError(f"bad line {line}")
+
+
+def test_pipeline_should_wire_commands_and_functions():
+    # when
+    result = asyncio.run(run_pipeline(Pipeline(["printf 'b\\na\\nc\\n'", ("sort",), upper]), opt, Environ()))
+
+    # then
+    assert result == "A\nB\nC\n"
+    assert result.statuses == [0, 0, 0]
+    assert result.command == "printf 'b\\na\\nc\\n' | sort | upper"
+
+
+def test_pipeline_should_stop_upstream_stages_reading_early():
+    # when
+    first = asyncio.run(run_pipeline(Pipeline([numbers, ("head", "-n", "2")]), opt, Environ()))
+    second = asyncio.run(run_pipeline(Pipeline([("seq", "1000000"), ("head", "-n", "2")]), opt, Environ()))
+
+    # then
+    assert first == "0\n1\n"
+    assert second == "1\n2\n"
+    assert second.statuses[1] == 0
+
+
+def test_pipeline_should_report_every_stage_status():
+    # when
+    result = asyncio.run(run_pipeline(Pipeline(["sh -c 'echo oops >&2; exit 3'", "cat"]), opt, Environ()))
+
+    # then
+    assert result.statuses == [3, 0]
+    assert result.errors == [b"oops\n", b""]
+
+
+def test_engine_should_raise_on_failing_stage(monkeypatch):
+    # given
+    def script():
+        yield Pipeline([("seq", "3"), "grep 9"])
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # then
+    with pytest.raises(Exception, match="grep 9: exited with status 1"):
+        with Unshell() as engine:
+            engine(script)
+
+
+def test_engine_should_raise_on_failing_function_stage(monkeypatch):
+    # given
+    def script():
+        yield Pipeline([("seq", "3"), failing, "cat"])
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # then
+    with pytest.raises(Exception, match="failing: bad line 1"):
+        with Unshell() as engine:
+            engine(script)
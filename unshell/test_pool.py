@@ -0,0 +1,79 @@
+# type: ignore
+
+# framework
+import pytest
+import asyncio
+# under test
+from .command import Cmd
+from .pool import ShellPool
+
+
+def run_on_pool(pool, commands):
+    async def main():
+        try:
+            results = await asyncio.gather(*[pool.run(command) for command in commands])
+            return [(result.stdout, result.stderr, result.returncode) for result in results]
+        finally:
+            await pool.close()
+
+    return asyncio.run(main())
+
+
+def test_pool_should_frame_output_and_status():
+    # given
+    pool = ShellPool(size=1)
+
+    # when
+    output = run_on_pool(pool, ["echo hello", "printf 'no newline'", "echo oops >&2; exit 3"])
+
+    # then
+    assert output == [
+        (b"hello\n", b"", 0),
+        (b"no newline", b"", 0),
+        (b"", b"oops\n", 3),
+    ]
+
+
+def test_pool_should_isolate_commands_sharing_a_worker():
+    # given
+    pool = ShellPool(size=1, cwd="/tmp")
+
+    # when
+    output = run_on_pool(pool, ["cd /; export FOO=bar", "pwd; echo \"FOO=$FOO\"", "exit 1", "echo alive"])
+
+    # then
+    assert output[1] == (b"/tmp\nFOO=\n", b"", 0)
+    assert output[3] == (b"alive\n", b"", 0)
+
+
+def test_pool_should_survive_syntax_errors():
+    # given
+    pool = ShellPool(size=1)
+
+    # when
+    output = run_on_pool(pool, ["if then", "echo ok"])
+
+    # then
+    assert output[0][2] != 0
+    assert output[1] == (b"ok\n", b"", 0)
+
+
+def test_pool_should_recycle_workers():
+    # given
+    pool = ShellPool(size=1, max_uses=2)
+
+    # when
+    output = run_on_pool(pool, ["echo $$", "echo $$", "echo $$"])
+
+    # then
+    assert output[0] == output[1]
+    assert output[1] != output[2]
+
+
+def test_pool_should_refuse_commands_with_limits():
+    # given
+    pool = ShellPool(size=1)
+
+    # then
+    with pytest.raises(ValueError, match="can not apply limits"):
+        run_on_pool(pool, [Cmd("make", limits={"cpu": 60})])
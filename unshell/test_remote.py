@@ -0,0 +1,160 @@
+# type: ignore
+
+# framework
+import time
+import pytest
+import asyncio
+# under test
+from .core import Unshell
+from .command import Cmd
+from .agent import Agent, is_loopback, parse_address, to_request
+from .remote import RemoteExecutor
+
+
+def address(bound):
+    return bound if isinstance(bound, str) else f"{bound[0]}:{bound[1]}"
+
+
+async def start_agents(count, token=None):
+    agents = [Agent("127.0.0.1:0", token) for _ in range(count)]
+    return agents, [address(await agent.start()) for agent in agents]
+
+
+def test_parse_address_should_tell_tcp_from_unix_sockets():
+    # then
+    assert parse_address("web1:7700") == ("web1", 7700)
+    assert parse_address("[::1]:7700") == ("::1", 7700)
+    assert parse_address("/run/unshell/agent.sock") == "/run/unshell/agent.sock"
+
+
+def test_agent_should_refuse_to_listen_beyond_loopback_without_token():
+    # then
+    assert is_loopback(("127.0.0.1", 7700)) and is_loopback(("::1", 7700)) and is_loopback(("localhost", 7700))
+    assert is_loopback("/run/unshell/agent.sock")
+    assert not is_loopback(("0.0.0.0", 7700)) and not is_loopback(("web1", 7700))
+    with pytest.raises(ValueError, match="without a token"):
+        Agent("0.0.0.0:7700")
+    assert Agent("0.0.0.0:7700", "s3cret").token == "s3cret"
+
+
+def test_to_request_should_send_engine_settings_only():
+    # given
+    opt = {"env": {"A": "1"}, "cwd": "/srv", "umask": None, "shell": "auto", "limits": {"cpu": 10}}
+
+    # when
+    request = to_request(Cmd(("ls", "-l"), env={"B": "2"}, limits={"nofile": 64}), opt)
+
+    # then
+    assert request == {
+        "command": ["ls", "-l"], "shell": "auto", "env": {"A": "1", "B": "2"}, "cwd": "/srv", "umask": None,
+        "limits": {"cpu": 10, "nofile": 64},
+    }
+
+
+def test_remote_executor_should_spread_commands_across_agents():
+    # given
+    outputs = []
+
+    def script():
+        outputs.append((yield [Cmd("sleep 0.05; echo $GREETING", env={"GREETING": "hi"})] * 6))
+        outputs.append((yield ("printf", "%s", "a b")))
+
+    async def main():
+        agents, addresses = await start_agents(2)
+        try:
+            async with Unshell({"reporter": "quiet", "executor": RemoteExecutor(addresses, concurrency=2)}) as engine:
+                await engine.run(script)
+        finally:
+            for agent in agents:
+                await agent.close()
+        return agents
+
+    # when
+    agents = asyncio.run(main())
+
+    # then
+    assert outputs == [["hi\n"] * 6, "a b"]
+    assert sorted(agent.served for agent in agents) == [3, 4]
+
+
+def test_remote_executor_should_skip_unreachable_agents():
+    # given
+    def script():
+        yield ["echo 1", "echo 2"]
+
+    async def main():
+        agents, addresses = await start_agents(1)
+        executor = RemoteExecutor(["127.0.0.1:1", *addresses])
+        try:
+            async with Unshell({"reporter": "quiet", "executor": executor}) as engine:
+                await engine.run(script)
+        finally:
+            await agents[0].close()
+        return executor, agents[0]
+
+    # when
+    executor, agent = asyncio.run(main())
+
+    # then
+    assert [connection.healthy for connection in executor.agents] == [False, True]
+    assert agent.served == 2
+
+
+def test_remote_executor_should_mark_agents_healthy_again():
+    # given
+    async def main():
+        agents, addresses = await start_agents(1)
+        executor = RemoteExecutor(addresses, health_interval=0.01)
+        executor.agents[0].healthy = False
+        executor.watch()
+        await asyncio.sleep(0.1)
+        healthy = executor.agents[0].healthy
+        await executor.close()
+        await agents[0].close()
+        return healthy
+
+    # then
+    assert asyncio.run(main()) is True
+
+
+def test_remote_executor_should_kill_timed_out_commands():
+    # given
+    def script():
+        yield "sleep 5"
+
+    async def main():
+        agents, addresses = await start_agents(1)
+        start = time.perf_counter()
+        try:
+            async with Unshell({"reporter": "quiet", "timeout": 0.2, "executor": RemoteExecutor(addresses)}) as engine:
+                with pytest.raises(Exception, match="timed out"):
+                    await engine.run(script)
+                await asyncio.sleep(0.1)
+            return time.perf_counter() - start, agents[0].served
+        finally:
+            await agents[0].close()
+
+    # when
+    elapsed, served = asyncio.run(main())
+
+    # then
+    assert elapsed < 2
+    assert served == 0
+
+
+def test_agent_should_refuse_requests_without_token():
+    # given
+    def script():
+        yield "echo secret"
+
+    async def main():
+        agents, addresses = await start_agents(1, token="s3cret")
+        try:
+            async with Unshell({"reporter": "quiet", "executor": RemoteExecutor(addresses, token="wrong")}) as engine:
+                await engine.run(script)
+        finally:
+            await agents[0].close()
+
+    # then
+    with pytest.raises(Exception, match="refused the token"):
+        asyncio.run(main())
@@ -0,0 +1,154 @@
+# type: ignore
+
+# framework
+import io
+import json
+import time
+import pytest
+import asyncio
+import threading
+from unittest.mock import MagicMock
+# mock
+import builtins
+# under test
+from .core import Unshell
+from .executor import DryRunExecutor
+from .result import CommandResult
+from .reporter import JsonReporter, PrefixReporter, ProgressReporter, excerpt, resolve_reporter
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, value):
+        self.writes += 1
+        return super().write(value)
+
+
+def test_excerpt_should_truncate_large_outputs():
+    # given
+    result = CommandResult("cat big", 0, b"a" * 10 + "é".encode())
+
+    # then
+    assert excerpt(result, None) == "a" * 10 + "é"
+    assert excerpt(result, 11) == "a" * 10 + "… (1 more bytes)"
+
+
+def test_prefix_reporter_should_batch_writes():
+    # given
+    stream = CountingStream()
+    reporter = PrefixReporter(stream, max_output=5)
+
+    async def main():
+        reporter.command("ls")
+        reporter.result(CommandResult("ls", 0, b"a\nb\ncdefgh\n"))
+        reporter.error("ls: boom")
+        await asyncio.sleep(0)
+
+    # when
+    asyncio.run(main())
+    reporter.close()
+
+    # then
+    assert stream.writes == 1
+    assert stream.getvalue() == "• ls\nls │ a\nls │ b\nls │ c… (6 more bytes)\n✘ ls: boom\n"
+
+
+def test_buffered_reporter_should_not_hold_up_the_loop_on_a_blocked_stream():
+    # given
+    released = threading.Event()
+
+    class BlockedStream(io.StringIO):
+        def write(self, value):
+            released.wait()
+            return super().write(value)
+
+    stream = BlockedStream()
+    reporter = PrefixReporter(stream)
+
+    async def main():
+        reporter.command("ls")
+        start = time.perf_counter()
+        await asyncio.sleep(0.05)
+        return time.perf_counter() - start
+
+    # when
+    elapsed = asyncio.run(main())
+    released.set()
+    reporter.close()
+
+    # then
+    assert elapsed < 1
+    assert stream.getvalue() == "• ls\n"
+
+
+def test_json_reporter_should_write_one_object_per_event():
+    # given
+    stream = io.StringIO()
+    reporter = JsonReporter(stream)
+
+    # when
+    reporter.command("ls")
+    reporter.result(CommandResult("ls", 0, b"file\n", pid=12))
+    reporter.flush()
+
+    # then
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["event"] for event in events] == ["command", "result"]
+    assert events[1]["stdout"] == "file\n"
+    assert events[1]["pid"] == 12
+
+
+def test_progress_reporter_should_keep_a_status_line():
+    # given
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream, interval=0)
+
+    # when
+    reporter.command("ls")
+    reporter.command("pwd")
+    reporter.result(CommandResult("ls", 0, b"file\n"))
+    reporter.error("pwd: boom")
+    reporter.flush()
+
+    # then
+    assert "\r\x1b[2K✘ pwd: boom\n" in stream.getvalue()
+    assert stream.getvalue().endswith("2/2 done, 0 running, 1 failed • pwd")
+
+
+def test_resolve_reporter_should_refuse_unknown_reporter():
+    with pytest.raises(ValueError):
+        resolve_reporter({"reporter": "unknown", "max_output": None})
+
+
+def test_engine_should_report_nothing_when_quiet(monkeypatch):
+    # given
+    def script():
+        yield "ls"
+
+    # mock
+    monkeypatch.setattr(builtins, "print", MagicMock())
+
+    # when
+    with Unshell({"reporter": "quiet", "executor": DryRunExecutor({"ls": "file"})}) as engine:
+        engine(script)
+
+    # then
+    builtins.print.assert_not_called()
+
+
+def test_reporters_should_summarize_saved_commands():
+    # given
+    stream = io.StringIO()
+    json_stream = io.StringIO()
+
+    # when
+    PrefixReporter(stream).summary({"deduped": 2, "hits": 0})
+    PrefixReporter(stream).summary({"deduped": 0})
+    JsonReporter(json_stream).summary({"deduped": 2})
+
+    # then
+    assert stream.getvalue() == "∑ 2 deduped\n"
+    assert json.loads(json_stream.getvalue())["deduped"] == 2
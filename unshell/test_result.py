@@ -0,0 +1,77 @@
+# type: ignore
+
+# framework
+import re
+import json
+import pickle
+import pytest
+# under test
+from .result import CommandResult, ScriptResult
+
+
+def test_command_result_should_read_as_its_stdout():
+    # given
+    result = CommandResult("docker ps -q", 0, b"abc\ndef\n")
+
+    # then
+    assert result == "abc\ndef\n"
+    assert str(result) == "abc\ndef\n"
+    assert f"ids: {result}" == "ids: abc\ndef\n"
+    assert result.split() == ["abc", "def"]
+    assert "abc" in result
+    assert result[:3] == "abc"
+    assert len(result) == 8
+    assert "> " + result == "> abc\ndef\n"
+    assert result + "!" == "abc\ndef\n!"
+
+
+def test_command_result_should_be_a_str_for_scripts():
+    # given
+    results = [CommandResult("wc -l", 0, b"12"), CommandResult("wc -l", 0, b"3")]
+
+    # then
+    assert all(isinstance(result, str) for result in results)
+    assert " ".join(results) == "12 3"
+    assert sorted(results) == ["12", "3"]
+    assert int(results[0]) == 12
+    assert json.loads(results[0]) == 12
+    assert re.search(r"\d+", results[0]).group() == "12"
+
+
+def test_command_result_should_keep_binary_outputs_as_bytes():
+    # given
+    result = CommandResult("cat image.png", 0, b"\xff\xfe", b"warn \xff\n")
+
+    # then
+    assert result.stdout == b"\xff\xfe"
+    assert result == "\ufffd\ufffd"
+    assert result.stderr_text == "warn \ufffd\n"
+    with pytest.raises(AttributeError):
+        result.typo
+
+
+def test_command_result_should_survive_pickling():
+    # given
+    result = CommandResult("echo hi", 0, b"hi\n", b"", 42, wall=0.5)
+
+    # when
+    copy = pickle.loads(pickle.dumps(result))
+
+    # then
+    assert copy == "hi\n"
+    assert (copy.command, copy.stdout, copy.pid, copy.wall) == ("echo hi", b"hi\n", 42, 0.5)
+
+
+def test_command_result_should_be_falsy_without_output():
+    # given
+    result = CommandResult("true", 0)
+
+    # then
+    assert not result
+    assert result.ok
+    assert result == ""
+
+
+def test_script_result_should_be_ok_without_error():
+    assert ScriptResult(None, ()).ok
+    assert not ScriptResult(None, (), error=Exception()).ok
@@ -0,0 +1,226 @@
+# type: ignore
+
+# framework
+import pytest
+import asyncio
+# under test
+from .scheduler import Scheduler
+
+
+def make_job(name, started, in_flight, peak):
+    async def job():
+        started.append(name)
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return name
+
+    return job
+
+
+def test_scheduler_should_bound_jobs_in_flight():
+    # given
+    started, in_flight, peak = [], [0], [0]
+    scheduler = Scheduler(2)
+    jobs = [make_job(i, started, in_flight, peak) for i in range(6)]
+
+    # when
+    output = asyncio.run(scheduler.gather(jobs))
+
+    # then
+    assert output == [0, 1, 2, 3, 4, 5]
+    assert started == [0, 1, 2, 3, 4, 5]
+    assert peak[0] == 2
+
+
+def test_scheduler_should_apply_per_call_limit_under_global_limit():
+    # given
+    started, in_flight, peak = [], [0], [0]
+    scheduler = Scheduler(4)
+    jobs = [make_job(i, started, in_flight, peak) for i in range(5)]
+
+    # when
+    output = asyncio.run(scheduler.gather(jobs, limit=1))
+
+    # then
+    assert output == [0, 1, 2, 3, 4]
+    assert peak[0] == 1
+
+
+def test_scheduler_should_not_bound_without_limit():
+    # given
+    started, in_flight, peak = [], [0], [0]
+    scheduler = Scheduler()
+    jobs = [make_job(i, started, in_flight, peak) for i in range(10)]
+
+    # when
+    asyncio.run(scheduler.gather(jobs))
+
+    # then
+    assert peak[0] == 10
+
+
+def test_scheduler_should_release_slot_of_cancelled_waiter():
+    # given
+    scheduler = Scheduler(1)
+
+    async def main():
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        scheduler.release()
+
+        await asyncio.wait_for(scheduler.acquire(), 1)
+
+    # then
+    asyncio.run(main())
+
+
+def test_scheduler_should_refuse_invalid_limit():
+    with pytest.raises(ValueError):
+        Scheduler(0)
+
+
+def test_scheduler_should_cancel_jobs_on_first_failure():
+    # given
+    finished = []
+    scheduler = Scheduler()
+
+    async def slow():
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    async def failing():
+        raise ValueError("boom")
+
+    # when
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.gather([slow, failing]))
+
+    # then
+    assert finished == []
+
+
+def test_scheduler_should_wait_all_jobs_without_fail_fast():
+    # given
+    finished = []
+    scheduler = Scheduler()
+
+    async def slow():
+        await asyncio.sleep(0.01)
+        finished.append("slow")
+
+    async def failing():
+        raise ValueError("boom")
+
+    # when
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.gather([failing, slow], fail_fast=False))
+
+    # then
+    assert finished == ["slow"]
+
+
+def test_as_completed_should_yield_results_as_they_finish():
+    # given
+    scheduler = Scheduler(2)
+
+    def sleeper(delay, value):
+        async def job():
+            await asyncio.sleep(delay)
+            return value
+        return job
+
+    jobs = [sleeper(0.05, "slow"), sleeper(0, "a"), sleeper(0, "b")]
+
+    async def main():
+        return [pair async for pair in scheduler.as_completed(jobs)]
+
+    # when
+    results = asyncio.run(main())
+
+    # then
+    assert results == [(1, "a"), (2, "b"), (0, "slow")]
+
+
+def test_as_completed_should_raise_failures_after_results_without_fail_fast():
+    # given
+    scheduler = Scheduler()
+    seen = []
+
+    async def fail():
+        raise ValueError("boom")
+
+    async def ok():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        async for pair in scheduler.as_completed([fail, ok], fail_fast=False):
+            seen.append(pair)
+
+    # when
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+    # then
+    assert seen == [(1, "ok")]
+
+
+def test_as_completed_should_cancel_remaining_jobs_when_closed():
+    # given
+    scheduler = Scheduler()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast():
+        return "fast"
+
+    async def main():
+        results = scheduler.as_completed([slow, fast])
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    # when
+    first = asyncio.run(main())
+
+    # then
+    assert first == (1, "fast")
+    assert cancelled == [True]
+
+
+def test_as_completed_should_start_jobs_before_iteration_and_cancel_them_on_exit():
+    # given
+    scheduler = Scheduler()
+    started = []
+    cancelled = []
+
+    async def job(name):
+        started.append(name)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    async def main():
+        async with scheduler.as_completed([lambda: job("a"), lambda: job("b")]):
+            await asyncio.sleep(0)
+            return list(started)
+
+    # when
+    before_iteration = asyncio.run(main())
+
+    # then
+    assert before_iteration == ["a", "b"]
+    assert cancelled == ["a", "b"]
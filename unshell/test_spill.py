@@ -0,0 +1,103 @@
+# type: ignore
+
+# framework
+import io
+import re
+import pytest
+import asyncio
+# under test
+from .core import Unshell
+from .reporter import PrefixReporter
+from .spill import SpilledResult, read_output
+
+
+def read(data, threshold):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_output(reader, threshold, None)
+
+    return asyncio.run(main())
+
+
+def test_read_output_should_keep_small_outputs_in_memory():
+    # when
+    output = read(b"small", 10)
+
+    # then
+    assert output == b"small"
+
+
+def test_read_output_should_spill_large_outputs_to_a_file():
+    # when
+    output = read(b"x" * 100, 10)
+
+    # then
+    output.seek(0)
+    assert output.read() == b"x" * 100
+
+
+def test_spilled_result_should_read_without_decoding_everything(tmp_path):
+    # given
+    file = open(tmp_path / "out", "w+b")
+    file.write("first\nsecond é\nlast".encode())
+    file.flush()
+
+    # when
+    with SpilledResult("cat big", 0, file) as result:
+        # then
+        assert list(result.lines()) == ["first", "second é", "last"]
+        assert list(result) == ["first\n", "second é\n", "last"]
+        assert result.search("second") == 6
+        assert "é" in result
+        assert "missing" not in result
+        assert result[0:5] == "first"
+        assert result[-1] == "t"
+        assert len(result) == len("first\nsecond é\nlast".encode())
+        assert bytes(result.buffer[:5]) == b"first"
+        assert result.text.endswith("last")
+        assert str(result).startswith("first")
+        assert result.split()[0] == "first"
+        assert result
+        assert not isinstance(result, str)
+        with pytest.raises(TypeError):  # rather than an empty match
+            re.search("second", result)
+        with pytest.raises(TypeError):
+            ",".join([result])
+        assert re.search("second", result.text)
+
+    assert file.closed
+
+
+def test_engine_should_spill_outputs_over_threshold():
+    # given
+    stream = io.StringIO()
+    outputs = []
+
+    def script():
+        outputs.append((yield "seq 1 2000"))
+        outputs.append((yield "echo small"))
+
+    # when
+    with Unshell({"spill": 1000, "reporter": PrefixReporter(stream, max_output=None)}) as engine:
+        engine(script)
+
+    # then
+    big, small = outputs
+    assert isinstance(big, SpilledResult)
+    assert not isinstance(small, SpilledResult)
+    assert sum(1 for _ in big.lines()) == 2000
+    assert "more bytes" in stream.getvalue()
+    big.close()
+
+
+def test_engine_should_raise_on_failure_with_spilled_output():
+    # given
+    def script():
+        yield "seq 1 100; echo oops >&2; exit 3"
+
+    # then
+    with Unshell({"spill": 10, "reporter": "quiet"}) as engine:
+        with pytest.raises(Exception, match="oops"):
+            engine(script)
@@ -0,0 +1,111 @@
+# type: ignore
+
+# framework
+import json
+import pytest
+# under test
+from .core import Unshell
+from .executor import DryRunExecutor
+from .trace import Span, Tracer, percentile, template
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+def test_template_should_replace_arguments_with_digits():
+    # then
+    assert template("docker pause 3f2a1") == "docker pause {}"
+    assert template("sleep 0.1") == "sleep {}"
+    assert template("docker ps -q") == "docker ps -q"
+
+
+def test_percentile_should_use_nearest_rank():
+    # given
+    values = [float(value) for value in range(1, 101)]
+
+    # then
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_tracer_should_summarize_commands_per_template():
+    # given
+    tracer = Tracer(clock=Clock())
+
+    # when
+    for name in ["sleep 1", "sleep 2", "ls"]:
+        tracer.end(tracer.start("command", name, queued_at=0.0))
+
+    # then
+    summary = tracer.summary()
+    assert summary["sleep {}"]["count"] == 2
+    assert summary["sleep {}"]["p50"] == 1.0
+    assert summary["ls"]["wait"] == 5.0
+
+
+def test_tracer_should_give_overlapping_spans_their_own_lane():
+    # given
+    tracer = Tracer()
+    tracer.spans = [Span("command", "a", 0.0), Span("command", "b", 1.0), Span("command", "c", 5.0)]
+    for span, end in zip(tracer.spans, [4.0, 2.0, 6.0]):
+        span.end = end
+
+    # when
+    events = tracer.chrome_trace()["traceEvents"]
+
+    # then
+    assert [event["tid"] for event in events] == [0, 1, 0]
+    assert events[0]["ph"] == "X"
+    assert events[0]["dur"] == 4e6
+    json.dumps(events)
+
+
+def test_tracer_should_record_script_steps_yields_and_commands():
+    # given
+    tracer = Tracer()
+    opt = {"executor": DryRunExecutor({"echo 1": "1\n"}), "reporter": "quiet", "tracer": tracer}
+
+    def script():
+        yield "echo 1"
+        yield ["echo 2", "echo 3"]
+
+    # when
+    with Unshell(opt) as engine:
+        engine(script)
+
+    # then
+    kinds = [span.kind for span in tracer.spans]
+    assert kinds.count("script") == 1
+    assert kinds.count("command") == 3
+    assert [span.name for span in tracer.spans if span.kind == "yield"] == ["echo 1", "[2 commands]"]
+    assert all(span.end >= span.start and span.wait >= 0 for span in tracer.spans)
+    assert next(span for span in tracer.spans if span.name == "echo 1").args["returncode"] == 0
+
+
+def test_tracer_should_time_failing_commands():
+    # given
+    tracer = Tracer()
+
+    def script():
+        yield "false"
+
+    # when
+    with Unshell({"reporter": "quiet", "tracer": tracer}) as engine:
+        with pytest.raises(Exception):
+            engine(script)
+
+    # then
+    assert [span.name for span in tracer.spans if span.kind == "command"] == ["false"]
+
+
+def test_engine_should_not_trace_by_default():
+    # then
+    assert Unshell({}).tracer is None
+    assert isinstance(Unshell({"tracer": True}).tracer, Tracer)
@@ -0,0 +1,119 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import re
+import time
+
+TEMPLATE_ARGUMENT = re.compile(r"(?<=\s)\S*\d\S*")
+
+
+class Span:
+    """A timed step of a run: a script, a generator step, a yield or a command"""
+    __slots__ = ("kind", "name", "start", "end", "wait", "args")
+
+    def __init__(self, kind: str, name: str, start: float, wait: float = 0.0) -> None:
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = start
+        self.wait = wait
+        self.args: Dict[str, Any] = {}
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Tracer:
+    """Record the spans of every script the engine runs, set it with the "tracer" option
+
+    Timestamps come from a monotonic clock, in seconds. Subclass on_start / on_end to
+    forward spans elsewhere. With no tracer, the engine skips every hook.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.spans: List[Span] = []
+
+    def start(self, kind: str, name: str, queued_at: Optional[float] = None) -> Span:
+        now = self.clock()
+        span = Span(kind, name, now, 0.0 if queued_at is None else now - queued_at)
+        self.on_start(span)
+
+        return span
+
+    def end(self, span: Span, **args: Any) -> None:
+        span.end = self.clock()
+        span.args.update(args)
+        self.spans.append(span)
+        self.on_end(span)
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        pass
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace-event JSON for chrome://tracing or Perfetto, overlapping spans get lanes of their own"""
+        lanes: Dict[str, List[float]] = {}
+        events = []
+
+        for span in sorted(self.spans, key=lambda span: (span.start, -span.end)):
+            kind_lanes = lanes.setdefault(span.kind, [])
+            lane = next((index for index, end in enumerate(kind_lanes) if end <= span.start), len(kind_lanes))
+            if lane == len(kind_lanes):
+                kind_lanes.append(span.end)
+            kind_lanes[lane] = span.end
+
+            events.append({
+                "name": span.name,
+                "cat": span.kind,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": span.kind,
+                "tid": lane,
+                "args": {"wait": span.wait, **span.args},
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        import json
+
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file, default=str)
+
+    def summary(self, kind: str = "command") -> Dict[str, Dict[str, float]]:
+        """count, total, p50, p95, p99 and mean queue wait of the spans per command template"""
+        durations: Dict[str, List[float]] = {}
+        waits: Dict[str, List[float]] = {}
+
+        for span in self.spans:
+            if span.kind == kind:
+                durations.setdefault(template(span.name), []).append(span.duration)
+                waits.setdefault(template(span.name), []).append(span.wait)
+
+        return {
+            name: {
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "wait": sum(waits[name]) / len(values),
+            }
+            for name, values in durations.items()
+        }
+
+
+def template(command: str) -> str:
+    """Group commands differing by their ids or numbers: docker pause 3f2a1 -> docker pause {}"""
+    return TEMPLATE_ARGUMENT.sub("{}", command)
+
+
+def percentile(values: List[float], rank: float) -> float:
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)  # nearest rank
+
+    return ordered[int(index)]
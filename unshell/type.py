@@ -1,13 +1,17 @@
-from typing import Any, Callable, Generator, AsyncGenerator, List, \
-    Union, Optional, Awaitable, Dict
+from typing import Any, Callable, Generator, AsyncGenerator, AsyncIterator, List, \
+    Union, Optional, Dict, Tuple
+from .command import AsCompleted, Compute, Stream, Gather, Graph, Pipeline, SingleCommand
+from .result import CommandResult
 
 Options = Dict[Any, Any]
 Args = Optional[Any]
 
-Command = Union[str, List[str]]
-CommandResult = Optional[Union[str, List[str]]]
-Commands = Generator[Command, CommandResult, Command]
-AsyncCommands = AsyncGenerator[Command, CommandResult]
+Command = Union[SingleCommand, List[SingleCommand], Stream, Gather, Graph, AsCompleted, Compute, Pipeline]
+YieldResult = Optional[Union[
+    CommandResult, List[CommandResult], Dict[str, Any], AsyncIterator[str], AsyncIterator[Tuple[int, CommandResult]]
+]]
+Commands = Generator[Command, YieldResult, Command]
+AsyncCommands = AsyncGenerator[Command, YieldResult]
 
 NoArgsScript = Callable[[], Commands]
 ArgsScript = Callable[[Args], Commands]
@@ -17,4 +21,4 @@ NoArgsAsyncScript = Callable[[], AsyncCommands]
 ArgsAsynScript = Callable[[Args], AsyncCommands]
 AsyncScript = Union[NoArgsAsyncScript, ArgsAsynScript]
 
-Engine = Callable[[Union[Script, AsyncScript], Args], Awaitable[None]]
+Engine = Callable[..., Any]
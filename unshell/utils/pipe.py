@@ -4,6 +4,7 @@ from functools import reduce
 
 
 def pipe(f1: Callable, *fns: Callable) -> Callable:
+    """Build a "a | b | c" command for /bin/sh, see unshell.Pipeline to chain stages without a shell"""
     def args(*args: Any) -> str:
         return reduce(
             lambda res, fn: f"{res} | {fn()}",